@@ -0,0 +1,186 @@
+"""Compare the WSGI and ASGI deployment modes side by side.
+
+Both modes get the same number of threads for handling requests. The WSGI
+server has a fixed pool like a gunicorn gthread worker, and the ASGI mode
+runs under uvicorn with ASGI_THREADS set to match. In each mode a number of
+clients keep /events streams open while others run the same page mix as
+benchmarks.load.
+
+Under WSGI every open stream holds one of the threads, so page latency
+rises once streams take up the pool, and pages stop being served once
+they take all of it.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.asgi --threads 8 --streams 0 4 16
+"""
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import logging
+import random
+import socket
+import threading
+import time
+
+import sqlalchemy as sa
+import uvicorn
+from werkzeug.serving import BaseWSGIServer
+
+from hackspace_storage.asgi import AsgiApp
+from hackspace_storage.database import db
+from hackspace_storage.models import Booking, Slot
+
+from .common import add_seed_options, make_app, reset_database, summarise
+from .load import Client, make_logins
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Handles connections on a fixed pool of threads, like gunicorn's gthread worker."""
+
+    def __init__(self, host: str, port: int, app, threads: int):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class Stream(threading.Thread):
+    """Holds an /events stream open until told to stop."""
+
+    def __init__(self, port: int, cookie: str, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.port = port
+        self.cookie = cookie
+        self.stop = stop
+        self.connected = threading.Event()
+        self.events = 0
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+        try:
+            conn.request("GET", "/events", headers={"Cookie": f"id={self.cookie}"})
+            response = conn.getresponse()
+            while not self.stop.is_set():
+                try:
+                    line = response.fp.readline()
+                except TimeoutError:
+                    continue
+                if not line:
+                    break
+                self.connected.set()
+                if line.startswith(b"event:"):
+                    self.events += 1
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi(app, threads: int):
+    server = PooledWSGIServer("127.0.0.1", 0, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def start_asgi(app, threads: int):
+    app.config["ASGI_THREADS"] = threads
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(AsgiApp(app), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return port, stop
+
+
+def run(mode: str, app, args, logins, slot_ids, bookings_by_user, stream_count: int):
+    start = start_wsgi if mode == "wsgi" else start_asgi
+    port, stop_server = start(app, args.threads)
+
+    stop = threading.Event()
+    streams = [Stream(port, cookie, stop) for _, cookie in random.choices(logins, k=stream_count)]
+    for stream in streams:
+        stream.start()
+    for stream in streams:
+        stream.connected.wait(5)
+
+    deadline = time.perf_counter() + args.duration
+    clients = [
+        Client("127.0.0.1", port, cookie, slot_ids, bookings_by_user[user_id], deadline)
+        for user_id, cookie in random.sample(logins, min(args.clients, len(logins)))
+    ]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        # Clients stuck behind a full pool never finish, so give up on them
+        client.join(args.duration + 10)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    for stream in streams:
+        stream.join(2)
+    stop_server()
+
+    samples = [sample for client in clients for name_samples in client.timings.values() for sample in name_samples]
+    connected = sum(stream.connected.is_set() for stream in streams)
+    events = sum(stream.events for stream in streams)
+    print(f"{mode:4} {stream_count:4} streams ({connected} connected, {events} events received)  "
+          f"{len(samples) / elapsed:7.1f} req/s  {sum(client.errors for client in clients)} errors")
+    if samples:
+        print(f"{'':4} {summarise(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_options(parser)
+    parser.add_argument("--threads", type=int, default=8, help="request threads in either mode")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--streams", type=int, nargs="+", default=[0, 4, 16], help="open /events streams")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    args = parser.parse_args()
+
+    app = make_app(
+        WTF_CSRF_ENABLED=False,
+        SERVER_NAME=None,
+        EVENTS_HEARTBEAT=1,
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_size": args.threads, "max_overflow": 0},
+    )
+    with app.app_context():
+        reset_database(args.areas, args.slots, args.users, args.bookings)
+        logins = make_logins()
+        slot_ids = db.session.scalars(sa.select(Slot.id)).all()
+        bookings_by_user = defaultdict(list)
+        for booking_id, user_id in db.session.execute(sa.select(Booking.id, Booking.user_id)):
+            bookings_by_user[user_id].append(booking_id)
+        db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    print(f"\n{args.threads} threads, {args.clients} clients, {args.duration:.0f}s per run")
+    for stream_count in args.streams:
+        for mode in ("wsgi", "asgi"):
+            run(mode, app, args, logins, slot_ids, bookings_by_user, stream_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Time the email action links for valid, stale and forged tokens.
+
+Forged links fail their signature check and stale ones have a good
+signature but a booking that's since gone, so only the stale and valid
+links should cost a query to look the booking up.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.booking_links --requests 2000
+"""
+import argparse
+import random
+import time
+
+import sqlalchemy as sa
+
+from hackspace_storage.booking_links import booking_links
+from hackspace_storage.booking_rules import new_booking_token
+from hackspace_storage.database import db
+from hackspace_storage.models import Booking
+from hackspace_storage.token import generate_token
+
+from .common import add_seed_options, make_app, reset_database, summarise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_options(parser)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per kind of link")
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        reset_database(args.areas, args.slots, args.users, args.bookings)
+        bookings = db.session.scalars(sa.select(Booking)).all()
+        tokens = [new_booking_token(booking) for booking in bookings]
+        db.session.commit()
+
+        valid = [booking_links.dumps(token, "free") for token in tokens]
+        stale = [booking_links.dumps(generate_token(), "free") for _ in tokens]
+        forged = [token[:-4] + "AAAA" for token in valid]
+
+        queries = 0
+
+        def count(*_):
+            nonlocal queries
+            queries += 1
+
+        sa.event.listen(db.engine, "before_cursor_execute", count)
+
+    client = app.test_client()
+    for label, tokens, status in (("valid", valid, 200), ("stale", stale, 403), ("forged", forged, 403)):
+        timings = []
+        queries = 0
+        for token in random.choices(tokens, k=args.requests):
+            started = time.perf_counter()
+            response = client.get(f"/bookings/free/{token}")
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == status, response.status_code
+        print(f"{label:6} {summarise(timings)}  {queries / args.requests:.1f} queries/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Fire concurrent booking attempts and check the database keeps them consistent.
+
+Two scenarios are run, each from many threads released at the same instant:
+
+* many members trying to book the same free slot, where exactly one may win;
+* one member trying to book many free slots, where no more than the
+  category's max_bookings may succeed.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.booking_race
+"""
+import argparse
+from datetime import date, timedelta
+import sys
+import threading
+
+import sqlalchemy as sa
+
+from hackspace_storage.booking_rules import BookingError, try_make_booking
+from hackspace_storage.database import db
+from hackspace_storage.models import Booking, Category, Slot, User
+
+from .common import make_app, reset_database
+
+
+def race(app, attempts: list[tuple[int, int]]) -> tuple[int, list[str]]:
+    """Run each (user_id, slot_id) booking attempt in its own thread."""
+    barrier = threading.Barrier(len(attempts))
+    successes = 0
+    failures = []
+    lock = threading.Lock()
+
+    def attempt(user_id: int, slot_id: int):
+        nonlocal successes
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            slot = db.session.get(Slot, slot_id)
+            # Load everything the booking checks need before the race starts
+            slot.area.category
+            barrier.wait()
+            try:
+                try_make_booking(user, slot, "race", date.today() + timedelta(days=3))
+            except BookingError as ex:
+                with lock:
+                    failures.append(ex.reason)
+            else:
+                with lock:
+                    successes += 1
+
+    threads = [threading.Thread(target=attempt, args=args) for args in attempts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return successes, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={"pool_size": args.threads, "max_overflow": 0})
+    with app.app_context():
+        reset_database(1, args.rounds + args.threads, args.threads, 0)
+        user_ids = db.session.scalars(sa.select(User.id).order_by(User.id)).all()
+        slot_ids = db.session.scalars(sa.select(Slot.id).order_by(Slot.id)).all()
+        max_bookings = db.session.scalar(sa.select(Category.max_bookings))
+        db.session.commit()
+
+    ok = True
+    for round in range(args.rounds):
+        successes, failures = race(app, [(user_id, slot_ids[round]) for user_id in user_ids])
+        print(f"Same slot, round {round}: {successes} booked, {len(failures)} refused")
+        ok &= successes == 1
+
+    with app.app_context():
+        db.session.execute(sa.delete(Booking))
+        db.session.commit()
+
+    successes, failures = race(app, [(user_ids[0], slot_id) for slot_id in slot_ids[:args.threads]])
+    print(f"Same member: {successes} booked, {len(failures)} refused (limit {max_bookings})")
+    ok &= successes == max_bookings
+
+    with app.app_context():
+        duplicates = db.session.scalar(
+            sa.select(sa.func.count()).select_from(
+                sa.select(Booking.slot_id).group_by(Booking.slot_id).having(sa.func.count() > 1).subquery()
+            )
+        )
+    print(f"Double-booked slots: {duplicates}")
+    ok &= duplicates == 0
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import statistics
+import sys
+
+from hackspace_storage import create_app
+from hackspace_storage.database import db
+from hackspace_storage.demo_data import seed_demo_data
+
+
+def make_app(**config):
+    """Create an app pointed at the scratch database named by BENCHMARK_DATABASE_URI.
+
+    The benchmarks drop and recreate every table, so never point this at a
+    database you care about.
+    """
+    uri = os.environ.get("BENCHMARK_DATABASE_URI")
+    if not uri:
+        sys.exit("Set BENCHMARK_DATABASE_URI to a scratch Postgres database, it will be wiped")
+
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "SECRET_KEY": "benchmark",
+        "SERVER_NAME": "localhost",
+        **config,
+    })
+
+
+def reset_database(area_count: int, slots_per_area: int, user_count: int, booking_count: int):
+    db.drop_all(bind_key=None)
+    db.create_all(bind_key=None)
+    seed_demo_data(area_count, slots_per_area, user_count, booking_count)
+    print(
+        f"Seeded {area_count} areas, {area_count * slots_per_area} slots, "
+        f"{user_count} users and {booking_count} bookings"
+    )
+
+
+def add_seed_options(parser):
+    parser.add_argument("--areas", type=int, default=100)
+    parser.add_argument("--slots", type=int, default=50, help="slots per area")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=3000)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarise(samples: list[float]) -> str:
+    """Format timings given in seconds as milliseconds."""
+    return (
+        f"p50 {percentile(samples, 50) * 1000:8.2f}ms  "
+        f"p95 {percentile(samples, 95) * 1000:8.2f}ms  "
+        f"p99 {percentile(samples, 99) * 1000:8.2f}ms  "
+        f"mean {statistics.fmean(samples) * 1000:8.2f}ms"
+    )
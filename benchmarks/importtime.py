@@ -0,0 +1,72 @@
+"""Measure what creating the app imports and how long it takes.
+
+Starts fresh interpreters under ``python -X importtime``, once just creating
+the app as a web worker does, and once also loading the nightly command as
+``flask nightly`` does. Reports the total import time of each and the
+packages that took longest to import.
+
+No database is needed.
+
+    python -m benchmarks.importtime --runs 10
+"""
+import argparse
+from collections import defaultdict
+import re
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    "create_app": (
+        "from hackspace_storage import create_app\n"
+        "create_app({'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://localhost/unused'})\n"
+    ),
+    "flask nightly": (
+        "from hackspace_storage import create_app\n"
+        "app = create_app({'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://localhost/unused'})\n"
+        "app.test_cli_runner().invoke(args=['nightly', '--help'])\n"
+    ),
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| +(\S+)")
+
+
+def import_times(code: str) -> dict[str, int]:
+    """Time in microseconds spent importing each package, not counting the
+    other packages it imports in turn."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True, capture_output=True, text=True,
+    ).stderr
+
+    times: defaultdict[str, int] = defaultdict(int)
+    for match in LINE.finditer(stderr):
+        own, module = match.groups()
+        times[module.split(".")[0]] += int(own)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="number of packages to list")
+    args = parser.parse_args()
+
+    for label, code in SCENARIOS.items():
+        totals = []
+        packages: defaultdict[str, list[int]] = defaultdict(list)
+        for _ in range(args.runs):
+            times = import_times(code)
+            totals.append(sum(times.values()))
+            for package, own in times.items():
+                packages[package].append(own)
+
+        print(f"\n== {label} ==")
+        print(f"total imports    median {statistics.median(totals) / 1000:8.2f}ms  min {min(totals) / 1000:8.2f}ms")
+        slowest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+        for package, samples in slowest[:args.top]:
+            print(f"  {package:30} {statistics.median(samples) / 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
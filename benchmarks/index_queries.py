@@ -0,0 +1,58 @@
+"""Check that the index page runs a fixed number of queries, however many
+bookings the member has.
+
+Renders / for a member with each of the given numbers of bookings, with the
+slot grid cache turned off so the grid's own queries are counted, and fails
+if any render runs more than MAX_QUERIES statements.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.index_queries --bookings 1 5 25
+"""
+import argparse
+import sys
+
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+
+from .common import make_app, reset_database
+from .load import make_logins
+
+# The login lookup, the member's bookings and the slot grid
+MAX_QUERIES = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--areas", type=int, default=5)
+    parser.add_argument("--slots", type=int, default=20, help="slots per area")
+    parser.add_argument("--bookings", type=int, nargs="+", default=[1, 5, 25], help="bookings held by the member")
+    args = parser.parse_args()
+
+    app = make_app(GRID_CACHE_ENABLED=False)
+    statements = []
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    ok = True
+    for booking_count in args.bookings:
+        with app.app_context():
+            # A single user, so every booking is theirs
+            reset_database(args.areas, args.slots, 1, booking_count)
+            (_, cookie), = make_logins()
+
+        client = app.test_client()
+        client.set_cookie("id", cookie)
+        statements.clear()
+        response = client.get("/")
+        print(f"{booking_count:4} bookings: {response.status_code}, {len(statements)} queries")
+        ok &= response.status_code == 200 and len(statements) <= MAX_QUERIES
+        if len(statements) > MAX_QUERIES:
+            for statement in statements:
+                print("    " + " ".join(statement.split())[:120])
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare query plans and timings with and without the foreign key indexes.
+
+Seeds a large dataset, then runs EXPLAIN ANALYZE over the queries behind the
+index page, a user's bookings and the nightly job. The "without" pass drops
+the indexes inside a transaction that is rolled back afterwards.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.indexes
+"""
+import argparse
+from datetime import date
+import re
+import statistics
+
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Area, Booking, Slot, User
+from hackspace_storage.nightly import expired, reminder_due
+
+from .common import add_seed_options, make_app, reset_database
+
+INDEXES = [
+    "ix_area_category_id",
+    "ix_slot_area_id",
+    "ix_booking_slot_id",
+    "ix_booking_user_id",
+    "ix_booking_expiry",
+    "ix_booking_reminder_date",
+    "ix_login_user_id",
+]
+
+
+def benchmark_queries():
+    user_id = db.session.scalar(sa.select(User.id).order_by(User.id.desc()).limit(1))
+    slot_id = db.session.scalar(sa.select(Slot.id).order_by(Slot.id.desc()).limit(1))
+    area_id = db.session.scalar(sa.select(Area.id).order_by(Area.id.desc()).limit(1))
+    today = date.today()
+
+    return {
+        "index: slots of an area": sa.select(Slot).where(Slot.area_id == area_id),
+        "index: bookings of a slot": sa.select(Booking).where(Booking.slot_id == slot_id),
+        "user.bookings": (
+            sa.select(Booking, Slot, Area)
+            .join(Booking.slot)
+            .join(Slot.area)
+            .where(Booking.user_id == user_id)
+        ),
+        "nightly: reminders due": sa.select(Booking.id).where(*reminder_due(today)),
+        "nightly: expired": sa.select(Booking.id).where(*expired(today)),
+    }
+
+
+def explain(conn: sa.Connection, query, repeat: int) -> tuple[str, list[float]]:
+    sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    timings = []
+    for _ in range(repeat):
+        plan = conn.execute(sa.text(f"EXPLAIN ANALYZE {sql}")).scalars().all()
+        match = re.search(r"Execution Time: ([\d.]+) ms", plan[-1])
+        timings.append(float(match.group(1)) if match else float("nan"))
+    return plan[0].strip(), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_options(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        reset_database(args.areas, args.slots, args.users, args.bookings)
+        queries = benchmark_queries()
+        # Release the session's locks so the indexes can be dropped
+        db.session.commit()
+
+        with db.engine.connect() as conn:
+            conn.execute(sa.text("ANALYZE"))
+            conn.commit()
+            for label, keep_indexes in (("without indexes", False), ("with indexes", True)):
+                print(f"\n== {label} ==")
+                with conn.begin() as transaction:
+                    if not keep_indexes:
+                        for index in INDEXES:
+                            conn.execute(sa.text(f"DROP INDEX {index}"))
+                    for name, query in queries.items():
+                        plan, timings = explain(conn, query, args.repeat)
+                        print(f"{name:28} median {statistics.median(timings):8.3f}ms  {plan}")
+                    transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Drive the app over HTTP with concurrent clients and report latency.
+
+Seeds a dataset, gives every user a login cookie, then runs the app in a
+threaded WSGI server and has each client hit a weighted mix of the main
+pages for a fixed duration. Reports p50/p95/p99 latency and throughput per
+endpoint along with the number of SQL queries each request ran.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.load --clients 16
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import http.client
+import logging
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from flask import Flask, g, request
+import sqlalchemy as sa
+from werkzeug.serving import make_server
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Booking, Login, Slot, User
+
+from .common import add_seed_options, make_app, reset_database, summarise
+
+LOGIN_SECRET = "benchmark"
+
+
+def make_logins() -> list[tuple[int, str]]:
+    """Log every user in, returning their ids and cookie values."""
+    now = datetime.now(timezone.utc)
+    logins = [
+        dict(id=uuid.uuid4(), secret=LOGIN_SECRET, user_id=user_id, created=now, expiry=now + timedelta(hours=1))
+        for user_id in db.session.scalars(sa.select(User.id))
+    ]
+    db.session.execute(sa.insert(Login), logins)
+    db.session.commit()
+    return [(login["user_id"], f"{login['id'].hex}:{LOGIN_SECRET}") for login in logins]
+
+
+def count_queries(app: Flask, counts: dict[str, list[int]]):
+    """Record how many SQL statements each request runs, grouped by endpoint."""
+    local = threading.local()
+
+    def before_cursor_execute(*args):
+        if getattr(local, "counting", False):
+            local.queries += 1
+
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    # Registered ahead of the login hook so its queries are counted too
+    def start():
+        local.counting = True
+        local.queries = 0
+
+    app.before_request_funcs.setdefault(None, []).insert(0, start)
+
+    @app.teardown_request
+    def stop(exc):
+        local.counting = False
+        counts[g.get("benchmark_endpoint", "other")].append(local.queries)
+
+
+class Client(threading.Thread):
+    def __init__(self, host: str, port: int, cookie: str, slot_ids: list[int], booking_ids: list[int], deadline: float):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.cookie = cookie
+        self.slot_ids = slot_ids
+        self.booking_ids = booking_ids
+        self.deadline = deadline
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.errors = 0
+
+    def request(self, name: str, method: str, path: str, body: str | None = None):
+        headers = {"Cookie": f"id={self.cookie}"}
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection(self.host, self.port)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                self.errors += 1
+        finally:
+            conn.close()
+        self.timings[name].append(time.perf_counter() - started)
+
+    def run(self):
+        expiry = (datetime.now().date() + timedelta(days=5)).isoformat()
+        scenarios = [
+            (70, lambda: self.request("index", "GET", "/")),
+            (10, lambda: self.request("book form", "GET", f"/slots/{random.choice(self.slot_ids)}/book")),
+            (10, lambda: self.request(
+                "book", "POST", f"/slots/{random.choice(self.slot_ids)}/book",
+                f"description=load+test&expiry_date={expiry}",
+            )),
+        ]
+        if self.booking_ids:
+            scenarios.append(
+                (10, lambda: self.request("extend", "GET", f"/bookings/{random.choice(self.booking_ids)}/extend"))
+            )
+        weights = [weight for weight, _ in scenarios]
+        actions = [action for _, action in scenarios]
+
+        while time.perf_counter() < self.deadline:
+            random.choices(actions, weights)[0]()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_options(parser)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    args = parser.parse_args()
+
+    app = make_app(
+        WTF_CSRF_ENABLED=False,
+        SERVER_NAME=None,
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_size": args.clients, "max_overflow": 0},
+    )
+    with app.app_context():
+        reset_database(args.areas, args.slots, args.users, args.bookings)
+        logins = make_logins()
+        slot_ids = db.session.scalars(sa.select(Slot.id)).all()
+        bookings_by_user = defaultdict(list)
+        for booking_id, user_id in db.session.execute(sa.select(Booking.id, Booking.user_id)):
+            bookings_by_user[user_id].append(booking_id)
+        db.session.commit()
+
+    query_counts: dict[str, list[int]] = defaultdict(list)
+    count_queries(app, query_counts)
+
+    @app.before_request
+    def label_endpoint():
+        g.benchmark_endpoint = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    deadline = time.perf_counter() + args.duration
+    clients = [
+        Client("127.0.0.1", server.server_port, cookie, slot_ids, bookings_by_user[user_id], deadline)
+        for user_id, cookie in random.sample(logins, min(args.clients, len(logins)))
+    ]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    for client in clients:
+        for name, samples in client.timings.items():
+            timings[name] += samples
+    total = sum(len(samples) for samples in timings.values())
+
+    print(f"\n{len(clients)} clients, {total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, "
+          f"{sum(client.errors for client in clients)} errors")
+    for name, samples in sorted(timings.items()):
+        print(f"{name:10} {len(samples):6} reqs {len(samples) / elapsed:7.1f}/s  {summarise(samples)}")
+
+    print("\nSQL queries per request")
+    for endpoint, counts in sorted(query_counts.items()):
+        print(f"{endpoint:40} mean {statistics.fmean(counts):5.1f}  max {max(counts):3}")
+
+
+if __name__ == "__main__":
+    main()
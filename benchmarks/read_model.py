@@ -0,0 +1,94 @@
+"""Compare loading the slot grid as ORM objects against the read model.
+
+Seeds a large dataset and then repeatedly loads the grid both ways,
+touching every field the grid template prints. Reports time per load and
+the peak memory allocated while loading, as measured by tracemalloc.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... python -m benchmarks.read_model --repeat 20
+"""
+import argparse
+import time
+import tracemalloc
+
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Area, Booking, Slot
+from hackspace_storage.read_model import load_slot_grid
+
+from .common import add_seed_options, make_app, reset_database, summarise
+
+
+def orm_grid() -> int:
+    """The grid as it was loaded before the read model."""
+    area_query = (
+        sa.select(Area)
+        .where(Area.slots.any())
+        .order_by(Area.name)
+        .options(
+            selectinload(Area.slots)
+            .selectinload(Slot.bookings)
+            .joinedload(Booking.user)
+        )
+    )
+    fields = 0
+    for area in db.session.scalars(area_query):
+        fields += len((area.name, area.column_count))
+        for slot in area.slots:
+            fields += len((slot.id, slot.name))
+            if slot.bookings:
+                booking = slot.bookings[0]
+                fields += len((booking.user.name, booking.description, booking.expiry))
+    return fields
+
+
+def read_model_grid() -> int:
+    fields = 0
+    for area in load_slot_grid():
+        fields += len((area.name, area.column_count))
+        for slot in area.slots:
+            fields += len((slot.id, slot.name))
+            if slot.booking:
+                booking = slot.booking
+                fields += len((booking.user_name, booking.description, booking.expiry))
+    return fields
+
+
+def measure(load, repeat: int) -> tuple[list[float], int, int]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fields = load()
+        timings.append(time.perf_counter() - started)
+        # A fresh session each time, as each request would have
+        db.session.remove()
+
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return timings, peak, fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_options(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        reset_database(args.areas, args.slots, args.users, args.bookings)
+
+        for label, load in (("orm", orm_grid), ("read model", read_model_grid)):
+            # Warm up the connection pool and statement caches first
+            load()
+            db.session.remove()
+            timings, peak, fields = measure(load, args.repeat)
+            print(f"{label:10} {summarise(timings)}  peak {peak / 1024 / 1024:6.1f}MiB  ({fields} fields)")
+
+
+if __name__ == "__main__":
+    main()
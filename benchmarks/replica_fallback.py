@@ -0,0 +1,197 @@
+"""Check that views marked for the replica fall back to the primary when
+the replica can't be trusted.
+
+Five cases are run against a real primary and streaming replica:
+
+* a caught up replica, which should be read from;
+* a replica with replay paused while the primary takes a write, which
+  should be skipped so the write is seen;
+* a replica cut off from the primary, by clearing its primary_conninfo, while
+  the primary takes a write, which should be skipped the same way;
+* a replica that can't be reached, which should be skipped too;
+* a new member logging in with a token while replay is paused but the
+  replica is still within its allowed lag, whose page and following
+  requests should read from the primary so their new rows are seen.
+
+Pausing replay and changing primary_conninfo need a superuser connection
+to the replica, and primary_conninfo is put back afterwards. The tables are
+dropped and recreated on the primary, so point this at scratch databases.
+
+    BENCHMARK_DATABASE_URI=postgresql+psycopg2://... \\
+    BENCHMARK_REPLICA_URI=postgresql+psycopg2://... python -m benchmarks.replica_fallback
+"""
+import argparse
+from collections import Counter
+import os
+import secrets
+import sys
+import time
+
+import jwt
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Area
+from hackspace_storage.replica import BIND, replica_reads
+
+from .common import make_app, reset_database
+
+MAX_LAG = 1
+
+
+def routed_read(app) -> tuple[bool, str]:
+    """Whether a replica_reads view would use the replica, and the area name it reads."""
+    @replica_reads
+    def view():
+        return db.session.info.get("read_bind") == BIND, db.session.scalar(sa.select(Area.name).order_by(Area.id).limit(1))
+
+    with app.test_request_context("/"):
+        try:
+            return view()
+        finally:
+            db.session.remove()
+
+
+def rename_area(app, name: str):
+    with app.app_context():
+        db.session.execute(sa.update(Area).where(Area.id == sa.select(sa.func.min(Area.id)).scalar_subquery()).values(name=name))
+        db.session.commit()
+
+
+def wait_for(app, expected: str, timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        used_replica, name = routed_read(app)
+        if used_replica and name == expected:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def token_login(app, replica) -> bool:
+    """Log a new member in with a token and load their pages, returning whether
+    they worked without touching the replica."""
+    statements = Counter()
+    with app.app_context():
+        for name, engine in db.engines.items():
+            sa.event.listen(engine, "before_cursor_execute", lambda *args, name=name: statements.update([name]))
+
+    token = jwt.encode(
+        dict(
+            sub=f"replica-check-{secrets.token_hex(4)}",
+            email="replica-check@example.com",
+            name="Replica Check",
+            nonce=secrets.token_urlsafe(),
+            exp=int(time.time()) + 60,
+        ),
+        app.config["LOGIN_START_SECRET"],
+        "HS256",
+    )
+
+    with replica.connect() as connection:
+        connection.execute(sa.text("SELECT pg_wal_replay_pause()"))
+    try:
+        client = app.test_client()
+        ok = True
+        for path in (f"/?login_token={token}", "/api/slots"):
+            statements.clear()
+            response = client.get(path)
+            print(f"Token login, GET {path.split('?')[0]}: {response.status_code}, queries {dict(statements)}")
+            ok &= response.status_code == 200 and not statements[BIND]
+        return ok
+    finally:
+        with replica.connect() as connection:
+            connection.execute(sa.text("SELECT pg_wal_replay_resume()"))
+
+
+def set_conninfo(connection, conninfo: str):
+    quoted = conninfo.replace("'", "''")
+    connection.execute(sa.text(f"ALTER SYSTEM SET primary_conninfo = '{quoted}'"))
+    connection.execute(sa.text("SELECT pg_reload_conf()"))
+
+
+def wal_receiver_running(replica) -> bool:
+    with replica.connect() as connection:
+        return connection.execute(sa.text("SELECT count(*) FROM pg_stat_wal_receiver")).scalar_one() > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    replica_uri = os.environ.get("BENCHMARK_REPLICA_URI")
+    if not replica_uri:
+        sys.exit("Set BENCHMARK_REPLICA_URI to a streaming replica of BENCHMARK_DATABASE_URI")
+
+    config = dict(REPLICA_MAX_LAG=MAX_LAG, REPLICA_LAG_CHECK_INTERVAL=0, GRID_CACHE_ENABLED=False)
+    app = make_app(SQLALCHEMY_BINDS={BIND: replica_uri}, **config)
+    with app.app_context():
+        reset_database(1, 1, 1, 0)
+
+    ok = True
+
+    rename_area(app, "caught up")
+    caught_up = wait_for(app, "caught up")
+    print(f"Caught up replica used: {caught_up}")
+    ok &= caught_up
+
+    replica = sa.create_engine(replica_uri, isolation_level="AUTOCOMMIT")
+    with replica.connect() as connection:
+        connection.execute(sa.text("SELECT pg_wal_replay_pause()"))
+    try:
+        rename_area(app, "written while paused")
+        # Long enough for the last replayed transaction to be further behind than MAX_LAG
+        time.sleep(MAX_LAG + 1)
+        used_replica, name = routed_read(app)
+        print(f"Paused replica: used {used_replica}, read {name!r}")
+        ok &= not used_replica and name == "written while paused"
+    finally:
+        with replica.connect() as connection:
+            connection.execute(sa.text("SELECT pg_wal_replay_resume()"))
+
+    resumed = wait_for(app, "written while paused")
+    print(f"Replica used again once resumed: {resumed}")
+    ok &= resumed
+
+    with replica.connect() as connection:
+        conninfo = connection.execute(sa.text("SHOW primary_conninfo")).scalar_one()
+        set_conninfo(connection, "")
+    try:
+        # Until the WAL receiver has gone, the write could still reach the replica
+        while wal_receiver_running(replica):
+            time.sleep(0.2)
+        rename_area(app, "written while disconnected")
+        time.sleep(MAX_LAG + 1)
+        used_replica, name = routed_read(app)
+        print(f"Disconnected replica: used {used_replica}, read {name!r}")
+        ok &= not used_replica and name == "written while disconnected"
+    finally:
+        with replica.connect() as connection:
+            set_conninfo(connection, conninfo)
+
+    reconnected = wait_for(app, "written while disconnected", timeout=30)
+    print(f"Replica used again once reconnected: {reconnected}")
+    ok &= reconnected
+
+    # Lag doesn't matter here, the login's own writes have to send its reads to the primary
+    lenient = make_app(SQLALCHEMY_BINDS={BIND: replica_uri}, **dict(config, REPLICA_MAX_LAG=3600))
+    ok &= token_login(lenient, replica)
+    replica.dispose()
+
+    unreachable = make_app(
+        SQLALCHEMY_BINDS={BIND: "postgresql+psycopg2://postgres@/nowhere?host=/nonexistent"},
+        **config,
+    )
+    with unreachable.app_context():
+        # Keep the app's error log quiet, the failed lag check is expected
+        unreachable.logger.disabled = True
+        used_replica, name = routed_read(unreachable)
+    print(f"Unreachable replica: used {used_replica}, read {name!r}")
+    ok &= not used_replica and name == "written while disconnected"
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
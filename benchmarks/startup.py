@@ -0,0 +1,75 @@
+"""Measure how long a freshly started worker takes to get its templates ready.
+
+Each sample is a new Python process that creates the app and then loads
+every template, the way a worker does over its first few requests. This is
+run with the bytecode cache disabled, with an empty cache, and with a cache
+filled beforehand by prewarm-templates.
+
+No database is needed.
+
+    python -m benchmarks.startup --runs 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+
+from .common import summarise
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from hackspace_storage import create_app
+app = create_app(json.loads(sys.argv[1]))
+created = time.perf_counter()
+env = app.jinja_env
+for name in env.list_templates():
+    env.get_template(name)
+loaded = time.perf_counter()
+print(json.dumps(dict(create_app=created - started, templates=loaded - created)))
+"""
+
+
+def run_child(config: dict) -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(config)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def report(label: str, samples: list[dict[str, float]]):
+    print(f"\n== {label} ==")
+    for key in ("create_app", "templates"):
+        print(f"{key:12} {summarise([sample[key] for sample in samples])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    config = dict(SQLALCHEMY_DATABASE_URI="postgresql+psycopg2://localhost/unused")
+
+    report("no bytecode cache", [
+        run_child(dict(config, TEMPLATE_CACHE_ENABLED=False)) for _ in range(args.runs)
+    ])
+
+    cold = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(run_child(dict(config, TEMPLATE_CACHE_DIR=cache_dir)))
+    report("empty bytecode cache", cold)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        warm_config = dict(config, TEMPLATE_CACHE_DIR=cache_dir)
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", f"hackspace_storage:create_app({warm_config!r})", "prewarm-templates"],
+            check=True,
+        )
+        report("prewarmed bytecode cache", [run_child(warm_config) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
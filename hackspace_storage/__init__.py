@@ -2,7 +2,6 @@ from datetime import timedelta
 import logging
 import os
 import sys
-import tomllib
 
 from flask import Flask
 
@@ -21,6 +20,7 @@ def create_app(test_config=None):
 
     if test_config is None:
         # load the instance config, if it exists, when not testing
+        import tomllib
         app.config.from_file("config.toml", load=tomllib.load, text=False, silent=True)
     else:
         # load the test config if passed in
@@ -43,23 +43,34 @@ def create_app(test_config=None):
 
 
 def register_extensions(app: Flask):
-    from .database import db, migrate
+    from .database import db
     from .login import login_manager
-    from . import booking_rules
+    from .cache import grid_cache
+    from .events import slot_events
+    from .instrumentation import instrumentation
+    from .replica import replica_router
+    from .booking_links import booking_links
+    from . import booking_rules, templating
     db.init_app(app)
-    migrate.init_app(app)
+    # Before the login manager so its per-request queries are counted
+    instrumentation.init_app(app)
     login_manager.init_app(app)
+    replica_router.init_app(app)
+    grid_cache.init_app(app)
+    slot_events.init_app(app)
     booking_rules.init_app(app)
+    booking_links.init_app(app)
+    templating.init_app(app)
 
 
 def register_blueprints(app: Flask):
     from hackspace_storage import main
     app.register_blueprint(main.views.bp)
 
-    # This provides no pages, but some CLI commands
-    from hackspace_storage import demo_data, nightly
-    app.register_blueprint(demo_data.bp)
-    app.register_blueprint(nightly.bp)
+    # The other blueprints provide no pages, only CLI commands, so they're
+    # left unregistered and only imported when one of their commands is run
+    from hackspace_storage import cli
+    cli.init_app(app)
 
 def configure_logger(app):
     """Configure loggers."""
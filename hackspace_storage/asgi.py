@@ -0,0 +1,88 @@
+"""Entry point for running under an ASGI server such as uvicorn.
+
+    uvicorn --factory hackspace_storage.asgi:create_asgi_app
+
+Requests are handled by the same Flask app as under WSGI, run on a pool of
+ASGI_THREADS threads. The event stream at /events is the exception. It is
+served on the event loop, so any number of open streams can be held without
+tying up a thread each.
+"""
+import asyncio
+import io
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import Flask, Response, abort, g
+from werkzeug.exceptions import HTTPException
+
+from hackspace_storage import create_app
+from hackspace_storage.events import slot_events
+
+
+class AsgiApp:
+    def __init__(self, app: Flask):
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=app.config.get("ASGI_THREADS", 10))
+        self.events_path = app.config.get("APPLICATION_ROOT", "/").rstrip("/") + "/events"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET" and scope["path"] == self.events_path:
+            await self.events(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    def authorize(self, scope) -> Response:
+        """Run the request through the app's usual hooks, so the login is checked
+        and recorded the same way as under WSGI, returning a 200 to go ahead
+        with the stream or the response to send instead."""
+        with self.app.request_context(build_environ(scope, io.BytesIO())):
+            try:
+                rv = self.app.preprocess_request()
+                if rv is None:
+                    if "user" not in g:
+                        abort(403)
+                    rv = self.app.response_class()
+            except HTTPException as ex:
+                rv = self.app.handle_user_exception(ex)
+            # Sets any login cookie and the status instrumentation records
+            return self.app.process_response(self.app.make_response(rv))
+
+    async def events(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.wsgi.executor, self.authorize, scope)
+        if response.status_code != 200:
+            await send(dict(
+                type="http.response.start",
+                status=response.status_code,
+                headers=[(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()],
+            ))
+            await send(dict(type="http.response.body", body=response.get_data()))
+            return
+
+        cookies = [(b"set-cookie", v.encode("latin-1")) for v in response.headers.getlist("Set-Cookie")]
+        await send(dict(
+            type="http.response.start",
+            status=200,
+            headers=[
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *cookies,
+            ],
+        ))
+
+        streaming = asyncio.create_task(self._stream(send))
+        try:
+            # Nothing more is expected from the client, this only returns once it goes away
+            while (await receive())["type"] != "http.disconnect":
+                pass
+        finally:
+            streaming.cancel()
+
+    async def _stream(self, send):
+        async for chunk in slot_events.astream():
+            await send(dict(type="http.response.body", body=chunk.encode(), more_body=True))
+
+
+def create_asgi_app(test_config=None) -> AsgiApp:
+    return AsgiApp(create_app(test_config))
@@ -0,0 +1,57 @@
+"""Signed links for acting on a booking from an email, without logging in.
+
+A link carries the booking's token, signed with the app's SECRET_KEY and a
+salt for the action, and is good for BOOKING_LINK_MAX_AGE seconds. Forged,
+stale or wrong-action links are turned away by checking the signature,
+before anything is read from the database. Valid ones are hashed with
+token_to_id and resolve with a lookup on the unique token_id index, so the
+stored ids alone can't be used to make a link. They stop working once the
+booking is gone or given a new token.
+"""
+from flask import Flask, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Booking
+from hackspace_storage.token import token_to_id
+
+ACTIONS = ("free", "extend")
+
+
+class BookingLinks:
+    def init_app(self, app: Flask):
+        self.max_age = app.config.get("BOOKING_LINK_MAX_AGE", 60*60*24*60)
+        self.serializers = {
+            action: URLSafeTimedSerializer(app.secret_key, salt=f"booking-{action}")
+            for action in ACTIONS
+        }
+
+        @app.context_processor
+        def booking_link_helpers():
+            return dict(booking_link=booking_link)
+
+        app.extensions["booking_links"] = self
+
+    def dumps(self, token: str, action: str) -> str:
+        return self.serializers[action].dumps(token)
+
+    def loads(self, link_token: str, action: str) -> str | None:
+        """The booking token a link was made for, or None if it isn't a valid link for the action."""
+        try:
+            return self.serializers[action].loads(link_token, max_age=self.max_age)
+        except BadSignature:
+            return None
+
+    def load_booking(self, link_token: str, action: str) -> Booking | None:
+        token = self.loads(link_token, action)
+        if token is None:
+            return None
+        return db.session.scalar(sa.select(Booking).where(Booking.token_id == token_to_id(token)))
+
+
+booking_links = BookingLinks()
+
+
+def booking_link(token: str, action: str) -> str:
+    return url_for(f"main.{action}_booking_link", token=booking_links.dumps(token, action), _external=True)
@@ -2,10 +2,14 @@ from datetime import date, timedelta
 from typing import Tuple
 
 from flask import Flask
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
 
+from hackspace_storage.cache import grid_cache
 from hackspace_storage.database import db
-from hackspace_storage.models import User, Slot, Booking
-from hackspace_storage.token import generate_token
+from hackspace_storage.events import slot_events
+from hackspace_storage.models import Area, Booking, Category, Slot, User, slot_version_seq
+from hackspace_storage.token import generate_token, token_to_id
 
 
 def init_app(app: Flask):
@@ -21,6 +25,25 @@ class BookingError(Exception):
         self.reason = reason
 
 
+# Arbitrary key for the advisory lock that hands out slot versions in commit order
+SLOT_VERSION_LOCK = 0x736c6f74
+
+
+def mark_slots_changed(slot_ids, event: str):
+    """Give the slots a new version and announce the change, as part of the
+    transaction that changed their bookings. Call it just before committing.
+
+    Versions come from a sequence, so without the lock a transaction could
+    take a lower version than one that commits before it, and clients that
+    had already seen the higher version would never be sent its change.
+    """
+    # As text rather than a Select, so it can't be routed to a replica
+    db.session.execute(sa.text("SELECT pg_advisory_xact_lock(:key)"), dict(key=SLOT_VERSION_LOCK))
+    query = sa.update(Slot).where(Slot.id.in_(slot_ids)).values(version=slot_version_seq.next_value())
+    db.session.execute(query, execution_options=dict(synchronize_session=False))
+    slot_events.publish(event, slot_ids)
+
+
 def can_make_booking(user: User, slot: Slot) -> Tuple[bool, str]:
     if len(slot.bookings) > 0:
         return False, "slot already booked"
@@ -30,29 +53,69 @@ def can_make_booking(user: User, slot: Slot) -> Tuple[bool, str]:
     return True, ""
 
 
-def try_make_booking(user: User, slot: Slot, description: str, expiry: date) -> Booking:
+def try_make_booking(user: User, slot: Slot, description: str, expiry: date) -> Tuple[Booking, str]:
+    """Book the slot, returning the booking and the token for its email links."""
+    # Lock the member's row so concurrent requests from them can't both pass the per-category limit
+    db.session.execute(sa.select(User.id).where(User.id == user.id).with_for_update())
+
     can_book, reason = can_make_booking(user, slot)
     if not can_book:
         raise BookingError(reason)
 
+    reminder_date = reminder_date_for(expiry, slot.area.category)
     booking = Booking(
         user=user,
         expiry=expiry,
         description=description,
-        secret=generate_token()
+        reminder_date=reminder_date,
+        # Already inside the extension period, so there's nothing to remind them about
+        reminder_sent=reminder_date <= date.today(),
     )
+    token = new_booking_token(booking)
     slot.bookings.append(booking)
-    db.session.commit()
+    try:
+        mark_slots_changed([slot.id], "booked")
+        db.session.commit()
+    except IntegrityError:
+        # Someone else booked the slot between our check and the insert
+        db.session.rollback()
+        raise BookingError("slot already booked")
+    grid_cache.invalidate()
+
+    return booking, token
+
+
+def new_booking_token(booking: Booking) -> str:
+    """Give the booking a new token for its email links. Only its hash is
+    stored, so links sent with an earlier token stop working."""
+    token = generate_token()
+    booking.token_id = token_to_id(token)
+    return token
+
+def reminder_date_for(expiry: date, category: Category) -> date:
+    return expiry - timedelta(days=category.extension_period_days)
+
+
+def update_reminder_dates(category_ids):
+    """Recompute reminder_date for every booking in the categories, for when
+    their extension period has changed."""
+    query = (
+        sa.update(Booking)
+        .where(
+            Booking.slot_id == Slot.id,
+            Slot.area_id == Area.id,
+            Area.category_id == Category.id,
+            Category.id.in_(category_ids),
+            Booking.reminder_date != Booking.expiry - Category.extension_period_days,
+        )
+        .values(reminder_date=Booking.expiry - Category.extension_period_days)
+    )
+    db.session.execute(query, execution_options=dict(synchronize_session=False))
 
-    return booking
 
 def can_extend_booking(booking: Booking):
-    category = booking.slot.area.category
-
-    extension_period = category.extension_period_days
-
-    reminder_date = booking.expiry - timedelta(days=extension_period)
-    if reminder_date > date.today():
+    if booking.reminder_date > date.today():
+        extension_period = (booking.expiry - booking.reminder_date).days
         return False, f"Can only extend within the last {extension_period} days"
 
     return True, ""
@@ -66,5 +129,15 @@ def extend_booking(booking: Booking):
     category = booking.slot.area.category
 
     booking.expiry += timedelta(days=category.extension_duration_days)
+    booking.reminder_date = reminder_date_for(booking.expiry, category)
     booking.extensions += 1
-    db.session.commit()
\ No newline at end of file
+    mark_slots_changed([booking.slot_id], "extended")
+    db.session.commit()
+    grid_cache.invalidate()
+
+
+def delete_booking(booking: Booking):
+    db.session.delete(booking)
+    mark_slots_changed([booking.slot_id], "freed")
+    db.session.commit()
+    grid_cache.invalidate()
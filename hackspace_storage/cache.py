@@ -0,0 +1,168 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Callable, Protocol
+
+from flask import Flask
+from markupsafe import Markup
+
+from hackspace_storage.replica import primary_reads
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> str | None: ...
+    def set(self, key: str, value: str, ttl: int | None = None): ...
+    def add(self, key: str, value: str, ttl: int | None = None) -> bool: ...
+    def delete(self, key: str): ...
+    def incr(self, key: str) -> int: ...
+    def counter(self, key: str) -> int: ...
+
+
+class LRUCacheBackend:
+    """In-process cache. Only coherent within a single worker process, so entries
+    should be given a TTL to bound staleness from changes made elsewhere."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        # Counters are kept apart from the entries so they are never evicted
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and time.monotonic() > expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int | None = None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value: str, ttl: int | None = None) -> bool:
+        """Set the key only if it isn't already present, returning whether it was set."""
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or time.monotonic() <= entry[1]):
+                return False
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+
+class RedisCacheBackend:
+    """Cache shared between processes through Redis or anything that speaks its protocol."""
+
+    def __init__(self, url: str, prefix: str = "hackspace_storage:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> str | None:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode()
+
+    def set(self, key: str, value: str, ttl: int | None = None):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def add(self, key: str, value: str, ttl: int | None = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, ex=ttl, nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(self.prefix + key)
+
+    def counter(self, key: str) -> int:
+        return int(self.get(key) or 0)
+
+
+def make_backend(app: Flask, prefix: str, size: int = 128) -> LRUCacheBackend | RedisCacheBackend:
+    backend = app.config.get(f"{prefix}_BACKEND", "lru")
+    if backend == "lru":
+        return LRUCacheBackend(app.config.get(f"{prefix}_SIZE", size))
+    if backend == "redis":
+        return RedisCacheBackend(app.config[f"{prefix}_REDIS_URL"])
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+class GridCache:
+    """Read-through cache of the rendered slot grid.
+
+    Entries are keyed by a version counter which is bumped whenever a booking
+    changes, so stale renders are never served again and simply age out.
+    """
+
+    VERSION_KEY = "grid:version"
+
+    def init_app(self, app: Flask):
+        self.enabled = app.config.get("GRID_CACHE_ENABLED", True)
+        self.ttl = app.config.get("GRID_CACHE_TTL", 60)
+        self.backend = make_backend(app, "GRID_CACHE")
+
+        app.extensions["grid_cache"] = self
+
+    def version(self) -> int:
+        return self.backend.counter(self.VERSION_KEY)
+
+    def get_or_render(self, render: Callable[[], str]) -> Markup:
+        if not self.enabled:
+            return Markup(render())
+
+        key = f"grid:{self.version()}"
+        html = self.backend.get(key)
+        if html is None:
+            # Shared entries come from the primary so replica lag can't outlive the lag itself
+            with primary_reads():
+                html = render()
+            self.backend.set(key, html, self.ttl)
+        return Markup(html)
+
+    def slot_version(self, load: Callable[[], int]) -> int:
+        """The newest Slot.version, so that unchanged polls don't need the database."""
+        # Keyed like the grid, so a version loaded just before an invalidate lands under a dead key
+        key = f"slots:version:{self.version()}"
+        version = self.backend.get(key)
+        if version is None:
+            with primary_reads():
+                version = load()
+            self.backend.set(key, str(version), self.ttl)
+        return int(version)
+
+    def invalidate(self):
+        self.backend.incr(self.VERSION_KEY)
+
+
+grid_cache = GridCache()
@@ -0,0 +1,65 @@
+from functools import cached_property
+from importlib import import_module
+from typing import Callable
+
+import click
+from flask import Flask
+
+# CLI commands and the module whose blueprint defines each of them
+COMMANDS = {
+    "make-demo-data": "demo_data",
+    "make-login": "demo_data",
+    "make-logout": "demo_data",
+    "nightly": "nightly",
+    "reap-logins": "nightly",
+    "mail-worker": "outbox",
+    "provision": "provisioning",
+    "prewarm-templates": "templating",
+}
+
+
+class LazyCommand(click.Command):
+    """Stands in for a CLI command until it is run or its help is needed.
+
+    Web workers and short lived commands then don't pay for importing the
+    modules behind every other command.
+    """
+
+    def __init__(self, name: str, load: Callable[[], click.Command]):
+        super().__init__(name)
+        self.load = load
+
+    @cached_property
+    def command(self) -> click.Command:
+        return self.load()
+
+    def get_short_help_str(self, limit: int = 45) -> str:
+        return self.command.get_short_help_str(limit)
+
+    def make_context(self, info_name, args, parent=None, **extra) -> click.Context:
+        # The context belongs to the real command, so that's what gets invoked
+        return self.command.make_context(info_name, args, parent=parent, **extra)
+
+
+def blueprint_command(module: str, name: str) -> Callable[[], click.Command]:
+    def load():
+        blueprint = import_module(f"hackspace_storage.{module}").bp
+        return blueprint.cli.commands[name]
+    return load
+
+
+def migrate_command(app: Flask) -> Callable[[], click.Command]:
+    # Flask-Migrate pulls in all of Alembic, which only `flask db` needs
+    def load():
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+        from .database import db
+        Migrate(app, db)
+        return db_cli_group
+    return load
+
+
+def init_app(app: Flask):
+    app.cli.add_command(LazyCommand("db", migrate_command(app)))
+    for name, module in COMMANDS.items():
+        app.cli.add_command(LazyCommand(name, blueprint_command(module, name)))
@@ -2,13 +2,32 @@ from datetime import datetime, timezone
 import functools
 from zoneinfo import ZoneInfo
 from flask import current_app
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import types
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, types
 from sqlalchemy.orm import Mapped, mapped_column
 
-db = SQLAlchemy()
-migrate = Migrate(db=db)
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to the bind named by ``info["read_bind"]``, if any.
+
+    Flushes, other statements and SELECT ... FOR UPDATE always use the usual bind.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        read_bind = self.info.get("read_bind")
+        if (
+            read_bind is not None
+            and bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            return self._db.engines[read_bind]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 Model = db.Model
 
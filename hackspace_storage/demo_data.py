@@ -1,20 +1,42 @@
 import click
 from flask import Blueprint, current_app
 import random
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import secrets
 import jwt
+import sqlalchemy as sa
 
+from hackspace_storage.booking_rules import reminder_date_for
 from hackspace_storage.database import db
 from hackspace_storage.models import Area, Category, Slot, Booking, User
 
 bp = Blueprint('demo', __name__, cli_group=None)
 
 
+AREA_LAYOUTS = [("Left", 3), ("Right", 4), ("Back", 2)]
+
+
 @bp.cli.command("make-demo-data")
-def make_demo_data():
-    db.drop_all()
-    db.create_all()
+@click.option('--areas', 'area_count', default=3, help='Number of areas to create')
+@click.option('--slots', 'slots_per_area', default=5, help='Number of slots in each area')
+@click.option('--users', 'user_count', default=1, help='Number of users to create')
+@click.option('--bookings', 'booking_count', type=int, help='Number of bookings to create, defaults to one per area')
+def make_demo_data(area_count: int, slots_per_area: int, user_count: int, booking_count: int | None):
+    # Only the primary, any replica bind follows along by itself
+    db.drop_all(bind_key=None)
+    db.create_all(bind_key=None)
+
+    seed_demo_data(area_count, slots_per_area, user_count, booking_count)
+
+
+def seed_demo_data(area_count=3, slots_per_area=5, user_count=1, booking_count=None):
+    """Fill an empty database with demo data.
+
+    Rows are inserted in bulk so this is also usable for seeding large
+    datasets for benchmarking.
+    """
+    if booking_count is None:
+        booking_count = area_count
 
     material_category = Category(
         name="material",
@@ -24,33 +46,54 @@ def make_demo_data():
         extension_period_days=10,
         max_extensions=2
     )
-
-    left_area = Area(name="Left", column_count=3, category=material_category)
-    right_area = Area(name="Right", column_count=4, category=material_category)
-    back_area = Area(name="Back", column_count=2, category=material_category)
-    areas = [left_area, right_area, back_area]
-
-    db.session.add_all(areas)
-
-    demo_user = User(
-        sub="demo",
-        email="example@demo.com",
-        name="Demo McDemoFace"
-    )
-
-    db.session.add(demo_user)
-
-    for area in areas:
-        for i in range(5):
-            area.slots.append(Slot(
-                name=f"{area.name[0]}{i:03}"
-            ))
-        month = random.randrange(1,12)
-        area.slots[0].bookings.append(Booking(
-            user=demo_user,
-            expiry=datetime(2025, month, 17),
-            description=f"Cool thingy"
+    db.session.add(material_category)
+    db.session.flush()
+
+    areas = []
+    for i in range(area_count):
+        name, column_count = AREA_LAYOUTS[i] if i < len(AREA_LAYOUTS) else (f"Area {i:03}", 4)
+        areas.append(dict(name=name, column_count=column_count, category_id=material_category.id))
+    area_ids = db.session.scalars(
+        sa.insert(Area).returning(Area.id, sort_by_parameter_order=True), areas
+    ).all()
+
+    slots = [
+        dict(name=f"{area['name'][0]}{i:03}", area_id=area_id)
+        for area, area_id in zip(areas, area_ids)
+        for i in range(slots_per_area)
+    ]
+    slot_ids = db.session.scalars(
+        sa.insert(Slot).returning(Slot.id, sort_by_parameter_order=True), slots
+    ).all()
+
+    users = [dict(sub="demo", email="example@demo.com", name="Demo McDemoFace")]
+    users += [
+        dict(sub=f"demo{i}", email=f"example{i}@demo.com", name=f"Demo User {i}")
+        for i in range(1, user_count)
+    ]
+    user_ids = db.session.scalars(
+        sa.insert(User).returning(User.id, sort_by_parameter_order=True), users
+    ).all()
+
+    # Spread the bookings out so each area gets its share, starting from the first slot
+    booked_slots = [
+        slot_ids[(i % area_count) * slots_per_area + (i // area_count)]
+        for i in range(min(booking_count, len(slot_ids)))
+    ]
+    today = date.today()
+    bookings = []
+    for i, slot_id in enumerate(booked_slots):
+        expiry = today + timedelta(days=random.randrange(-3, 21))
+        bookings.append(dict(
+            slot_id=slot_id,
+            user_id=user_ids[i % len(user_ids)],
+            expiry=expiry,
+            reminder_date=reminder_date_for(expiry, material_category),
+            description="Cool thingy",
         ))
+    if bookings:
+        db.session.execute(sa.insert(Booking), bookings)
+
     db.session.commit()
 
 @bp.cli.command("make-login")
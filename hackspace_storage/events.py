@@ -0,0 +1,167 @@
+import asyncio
+from contextlib import contextmanager
+import json
+import queue
+import select
+import threading
+import time
+
+from flask import Flask
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from hackspace_storage.database import db
+
+CHANNEL = "slot_events"
+
+
+class AsyncSubscriber:
+    """Hands events over to a stream running on an asyncio event loop, as
+    they're broadcast from other threads."""
+
+    def __init__(self, size: int):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(size)
+
+    def put_nowait(self, event: dict):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class SlotEvents:
+    """Fans slot booked/extended/freed events out to every open event stream.
+
+    Events are published inside the transaction that causes them and only go
+    out once it commits. With the default "local" backend they only reach
+    streams in the same process. The "postgres" backend sends them through
+    NOTIFY so changes made by other workers or the nightly command are seen
+    too, with one LISTEN thread per process doing the fan-out.
+    """
+
+    def __init__(self):
+        self._subscribers: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+
+    def init_app(self, app: Flask):
+        self.backend = app.config.get("EVENTS_BACKEND", "local")
+        self.heartbeat = app.config.get("EVENTS_HEARTBEAT", 15)
+        self.queue_size = app.config.get("EVENTS_QUEUE_SIZE", 100)
+        self.app = app
+
+        app.extensions["slot_events"] = self
+
+    def publish(self, kind: str, slot_ids):
+        event = dict(type=kind, slots=sorted(slot_ids))
+        if self.backend == "postgres":
+            # Postgres holds notifications back until the transaction commits
+            db.session.execute(sa.select(sa.func.pg_notify(CHANNEL, json.dumps(event))))
+        else:
+            db.session.info.setdefault("slot_events", []).append(event)
+
+    def _broadcast(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled client shouldn't hold up everyone else, it can catch up with /api/slots?since=
+                pass
+
+    @contextmanager
+    def subscribe(self, subscriber: queue.Queue | AsyncSubscriber | None = None):
+        if self.backend == "postgres":
+            self._start_listener()
+
+        if subscriber is None:
+            subscriber = queue.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def stream(self):
+        """Server-sent events for one client, with comments as keepalives."""
+        with self.subscribe() as subscriber:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self._format(event)
+
+    async def astream(self):
+        """Same as stream, but waits on the event loop rather than holding a thread."""
+        subscriber = AsyncSubscriber(self.queue_size)
+        with self.subscribe(subscriber):
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self._format(event)
+
+    def _format(self, event: dict) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="slot-events", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        reconnecting = False
+        while True:
+            try:
+                with self.app.app_context():
+                    connection = db.engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                # Kept out of the pool for good as it sits in LISTEN forever
+                connection.detach()
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+
+                if reconnecting:
+                    # Anything sent while we were disconnected is lost, tell clients to refetch
+                    self._broadcast(dict(type="resync", slots=[]))
+
+                while True:
+                    select.select([dbapi_connection], [], [], self.heartbeat)
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        self._broadcast(json.loads(notify.payload))
+            except Exception:
+                self.app.logger.exception("Slot event listener failed, reconnecting")
+                reconnecting = True
+                time.sleep(5)
+
+
+slot_events = SlotEvents()
+
+
+@sa.event.listens_for(Session, "after_commit")
+def _send_local_events(session: Session):
+    for event in session.info.pop("slot_events", []):
+        slot_events._broadcast(event)
+
+
+@sa.event.listens_for(Session, "after_rollback")
+def _drop_local_events(session: Session):
+    session.info.pop("slot_events", None)
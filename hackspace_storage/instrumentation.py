@@ -0,0 +1,150 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+
+from flask import Flask, Response, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.status = 500
+        self.durations: defaultdict[str, float] = defaultdict(float)
+        self.render_starts: list[float] = []
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class Metrics:
+    """Per-process totals, labelled by endpoint, in the shape Prometheus expects."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: defaultdict[tuple[str, int], int] = defaultdict(int)
+        self.sums: defaultdict[tuple[str, str], float] = defaultdict(float)
+
+    def record(self, endpoint: str, status: int, timing: RequestTiming):
+        with self.lock:
+            self.requests[endpoint, status] += 1
+            self.sums["request_duration_seconds", endpoint] += timing.total()
+            self.sums["db_queries", endpoint] += timing.queries
+            for name, duration in timing.durations.items():
+                self.sums[f"{name}_duration_seconds", endpoint] += duration
+
+    def render(self) -> str:
+        with self.lock:
+            lines = [
+                "# HELP hackspace_requests_total Requests handled by this process",
+                "# TYPE hackspace_requests_total counter",
+            ]
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'hackspace_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for metric in sorted({metric for metric, _ in self.sums}):
+                name = f"hackspace_{metric}_total"
+                lines.append(f"# TYPE {name} counter")
+                for (other, endpoint), value in sorted(self.sums.items()):
+                    if other == metric:
+                        lines.append(f'{name}{{endpoint="{endpoint}"}} {value:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+class Instrumentation:
+    """Counts SQL queries and times the database, template rendering and SMTP
+    for each request. Results go out in a Server-Timing header and are totalled
+    for the /metrics endpoint. Disabled unless INSTRUMENTATION_ENABLED is set."""
+
+    def init_app(self, app: Flask):
+        self.enabled = app.config.get("INSTRUMENTATION_ENABLED", False)
+        app.extensions["instrumentation"] = self
+        if not self.enabled:
+            return
+
+        self.metrics = Metrics()
+
+        with app.app_context():
+            for engine in db.engines.values():
+                sa.event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                sa.event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+        app.before_request(self._start)
+        app.after_request(self._server_timing)
+        app.teardown_request(self._record)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def _timing(self) -> RequestTiming | None:
+        if not has_request_context():
+            return None
+        return g.get("request_timing")
+
+    @contextmanager
+    def timer(self, name: str):
+        """Add the time spent inside the block to the current request's total for ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self._timing()
+            if timing is not None:
+                timing.durations[name] += time.perf_counter() - started
+
+    def _start(self):
+        g.request_timing = RequestTiming()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        timing = self._timing()
+        if timing is not None:
+            timing.queries += 1
+            timing.durations["db"] += time.perf_counter() - started
+
+    def _before_render(self, sender, template, context, **extra):
+        timing = self._timing()
+        if timing is not None:
+            timing.render_starts.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        timing = self._timing()
+        if timing is not None and timing.render_starts:
+            started = timing.render_starts.pop()
+            # Only count the outermost render so nested templates aren't counted twice
+            if not timing.render_starts:
+                timing.durations["render"] += time.perf_counter() - started
+
+    def _server_timing(self, response: Response) -> Response:
+        timing = self._timing()
+        if timing is None:
+            return response
+
+        timing.status = response.status_code
+        entries = [f'db;dur={timing.durations["db"] * 1000:.2f};desc="{timing.queries} queries"']
+        for name, duration in timing.durations.items():
+            if name != "db":
+                entries.append(f"{name};dur={duration * 1000:.2f}")
+        entries.append(f"total;dur={timing.total() * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    def _record(self, exc):
+        timing = g.pop("request_timing", None)
+        if timing is None or request.endpoint == "metrics":
+            return
+        self.metrics.record(request.endpoint or "unmatched", timing.status, timing)
+
+    def metrics_view(self):
+        return Response(self.metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+instrumentation = Instrumentation()
@@ -3,13 +3,15 @@ from functools import wraps
 import secrets
 import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased, joinedload
 from typing import Any
 import uuid
-import jwt
 from flask import Flask, Request, Response, abort, after_this_request, current_app, g, request, session
 
+from hackspace_storage.cache import make_backend
 from hackspace_storage.models import User, Login
 from hackspace_storage.database import db
+from hackspace_storage.replica import mark_written
 
 
 def _make_timedelta(value: timedelta | int) -> timedelta:
@@ -23,9 +25,15 @@ class LoginManager:
     def init_app(self, app: Flask):
         self.idle_timeout = _make_timedelta(app.config.get("LOGIN_IDLE_TIMEOUT", 60*10))
         self.absolute_timeout = _make_timedelta(app.config.get("LOGIN_ABSOLUTE_TIMEOUT", 60*60))
+        # Sliding expiry is only written back once it has moved by at least this much
+        self.expiry_refresh = _make_timedelta(app.config.get("LOGIN_EXPIRY_REFRESH", 60))
         self.cookie_name = app.config.get("LOGIN_COOKIE_NAME", "id")
         self.cookie_secure = app.config.get("LOGIN_COOKIE_SECURE", False)
         self.start_secret = app.config["LOGIN_START_SECRET"]
+        # Login tokens seen recently, kept until they expire so they can't be replayed.
+        # The default in-process cache only covers one worker, use LOGIN_NONCE_CACHE_BACKEND="redis"
+        # to share it between them.
+        self.nonces = make_backend(app, "LOGIN_NONCE_CACHE", size=10000)
 
         app.extensions["login_manager"] = self
         app.before_request(self._do_login)
@@ -39,6 +47,8 @@ class LoginManager:
             self.login_from_cookie()
 
     def login_from_token(self, login_token: str):
+        import jwt
+
         try:
             decoded_token: dict[str, Any] = jwt.decode(
                 login_token,
@@ -53,58 +63,77 @@ class LoginManager:
         # Protection against using a logout token as a login token
         if "nonce" not in decoded_token:
             return None
-        
-        user = self.create_user_from_id_token(decoded_token)
-        self.create_login(user, decoded_token.get("sid"))
-
-    def create_user_from_id_token(self, decoded_token: dict[str, Any]) -> User:
-        sub = decoded_token["sub"]
-        email = decoded_token["email"]
-        name = decoded_token["name"]
-
-        stmt = insert(User).values(
-            sub=sub,
-            email=email,
-            name=name
-        ).on_conflict_do_update(
-            index_elements=[User.sub],
-            set_=dict(
-                email=email,
-                name=name
-            )
-        ).returning(User)
 
-        orm_stmt = sa.select(User).from_statement(stmt).execution_options(populate_existing=True)
+        if not self.claim_token(decoded_token):
+            current_app.logger.warning(f"Rejected replayed login token for {decoded_token.get('sub')}")
+            return None
 
-        user = db.session.execute(orm_stmt).scalar_one()
-        db.session.commit()
+        self.create_login(decoded_token)
+
+    def claim_token(self, decoded_token: dict[str, Any]) -> bool:
+        """Record a login token as used, returning False if it has been seen before."""
+        token_id = decoded_token.get("jti") or decoded_token["nonce"]
+        # No point remembering it once jwt.decode would reject it as expired anyway
+        ttl = max(int(decoded_token["exp"] - datetime.now(timezone.utc).timestamp()) + 1, 1)
+        return self.nonces.add(f"login_nonce:{token_id}", "1", ttl)
 
-        return user
+    def create_login(self, decoded_token: dict[str, Any]):
+        """Upsert the user from the token claims along with a new login for them.
 
-    def create_login(self, user: User, sid: str|None):
+        Both upserts go out as a single statement, the login insert selecting
+        the user id from the user upsert in a CTE.
+        """
         now = datetime.now(timezone.utc)
         expiry = now + self.idle_timeout
         secret = secrets.token_urlsafe()
+
+        user_stmt = insert(User).values(
+            sub=decoded_token["sub"],
+            email=decoded_token["email"],
+            name=decoded_token["name"],
+        )
+        user_stmt = user_stmt.on_conflict_do_update(
+            index_elements=[User.sub],
+            set_=dict(
+                email=user_stmt.excluded.email,
+                name=user_stmt.excluded.name,
+            )
+        ).returning(*User.__table__.columns)
+        user_cte = user_stmt.cte("upserted_user")
+
         # If there's an existing session with the same sid then we'll re-use that with a new secret
-        stmt = insert(Login).values(
-            id=uuid.uuid4(),
-            secret=secret,
-            external_id=sid,
-            user_id=user.id,
-            created=now,
-            expiry=expiry
-        ).on_conflict_do_update(
+        login_values = sa.select(
+            sa.literal(uuid.uuid4(), Login.id.type),
+            sa.literal(secret, Login.secret.type),
+            sa.literal(decoded_token.get("sid"), Login.external_id.type),
+            user_cte.c.id,
+            sa.literal(now, Login.created.type),
+            sa.literal(expiry, Login.expiry.type),
+        )
+        login_stmt = insert(Login).from_select(
+            ["id", "secret", "external_id", "user_id", "created", "expiry"],
+            login_values,
+        )
+        login_stmt = login_stmt.on_conflict_do_update(
             index_elements=[Login.external_id],
             set_=dict(
-                secret=secret,
-                user_id=user.id,
-                created=now,
-                expiry=expiry,
+                secret=login_stmt.excluded.secret,
+                user_id=login_stmt.excluded.user_id,
+                created=login_stmt.excluded.created,
+                expiry=login_stmt.excluded.expiry,
             )
-        ).returning(Login)
-
-        orm_stmt = sa.select(Login).from_statement(stmt).execution_options(populate_existing=True)
-        login: Login = db.session.execute(orm_stmt).scalar_one()
+        ).returning(*Login.__table__.columns)
+        login_cte = login_stmt.cte("upserted_login")
+
+        upserted_user = aliased(User, user_cte)
+        upserted_login = aliased(Login, login_cte)
+        orm_stmt = sa.select(upserted_user, upserted_login).where(
+            upserted_login.user_id == upserted_user.id
+        ).execution_options(populate_existing=True)
+        user, login = db.session.execute(orm_stmt).one()
+        # The upserts look like a plain SELECT to the replica router, so tell it they wrote
+        mark_written()
+        session_value = f"{login.id.hex}:{secret}"
         db.session.commit()
 
         g.user = user
@@ -112,7 +141,6 @@ class LoginManager:
 
         @after_this_request
         def update_session(response: Response):
-            session_value = f"{login.id.hex}:{secret}"
             response.set_cookie(
                 self.cookie_name,
                 session_value,
@@ -134,12 +162,12 @@ class LoginManager:
             return
 
         login_id, secret = login_cookie
-        login = db.session.get(Login, login_id)
+        login = db.session.get(Login, login_id, options=[joinedload(Login.user)])
         if login is None:
             return
 
         # Check for idle or absolute session timeouts
-        if now > login.expiry or now > (login.created + self.absolute_timeout):
+        if self.is_expired(login, now):
             db.session.delete(login)
             db.session.commit()
             return
@@ -151,11 +179,52 @@ class LoginManager:
         g.user = login.user
         g.login = login
 
-        # Reset the session expiry for every request
-        login.expiry = now + self.idle_timeout
-        db.session.commit()
+        # Slide the session expiry along, but skip the write if it would barely move
+        expiry = now + self.idle_timeout
+        if expiry - login.expiry >= self.expiry_refresh:
+            login.expiry = expiry
+            db.session.commit()
+
+    def is_expired(self, login: Login, now: datetime) -> bool:
+        return now > login.expiry or now > (login.created + self.absolute_timeout)
+
+    def expired(self, now: datetime):
+        """Query criteria matching the logins is_expired would reject."""
+        return sa.or_(Login.expiry < now, Login.created < now - self.absolute_timeout)
 
     def process_logout_token(self, logout_token: str) -> bool:
+        sids = self.decode_logout_token(logout_token)
+        if sids is None:
+            return False
+
+        self.delete_logins(sids)
+
+        return True
+
+    def process_logout_tokens(self, logout_tokens: list[str]) -> bool:
+        """Log out every session named by a batch of logout tokens.
+
+        The batch is all or nothing, if any token is invalid then no sessions are ended.
+        """
+        sids = []
+        for logout_token in logout_tokens:
+            token_sids = self.decode_logout_token(logout_token)
+            if token_sids is None:
+                return False
+            sids += token_sids
+
+        self.delete_logins(sids)
+
+        return True
+
+    def decode_logout_token(self, logout_token: str) -> list[str] | None:
+        """Validate a logout token, returning the sids it ends or None if invalid.
+
+        As well as the usual single ``sid`` claim, a token can carry a list of
+        them in ``sids`` so a whole batch of sessions can be ended at once.
+        """
+        import jwt
+
         try:
             decoded_token: dict[str, Any] = jwt.decode(
                 logout_token,
@@ -165,26 +234,32 @@ class LoginManager:
             )
         except jwt.PyJWTError as ex:
             current_app.logger.warning(f"Error decoding logout token {ex}")
-            return False
+            return None
         
         events = decoded_token.get("events", {})
         if "http://schemas.openid.net/event/backchannel-logout" not in events:
-            return False
+            return None
         
         # nonce is forbidden in the logout token 
         if "nonce" in decoded_token:
-            return False
-        
-        sid = decoded_token.get("sid")
-        if not sid:
-            return False
+            return None
         
-        self.delete_login(sid)
+        sids = decoded_token.get("sids", [])
+        # A string would otherwise be taken as a list of one-character sids
+        if not isinstance(sids, list):
+            return None
+        if decoded_token.get("sid"):
+            sids = [decoded_token["sid"], *sids]
+        if not sids or not all(isinstance(sid, str) and sid for sid in sids):
+            return None
 
-        return True
+        return sids
     
     def delete_login(self, sid: str):
-        query = sa.delete(Login).where(Login.external_id==sid)
+        self.delete_logins([sid])
+
+    def delete_logins(self, sids: list[str]):
+        query = sa.delete(Login).where(Login.external_id.in_(sids))
         db.session.execute(query)
         db.session.commit()
 
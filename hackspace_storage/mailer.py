@@ -1,12 +1,17 @@
-import smtplib, ssl
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import time
+from typing import TYPE_CHECKING
 from email.utils import formataddr
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-from flask import current_app, render_template
+from flask import current_app, g, render_template
 from jinja2 import TemplateNotFound
 
-from hackspace_storage.models import User
+from hackspace_storage.database import db
+from hackspace_storage.models import OutboxEmail, User
+
+if TYPE_CHECKING:
+    from hackspace_storage.smtp import SMTPSender
 
 def send_email(user: User, template: str, subject: str, **kwargs):
     sender_email = current_app.config["SENDER_EMAIL"]
@@ -19,45 +24,90 @@ def send_email(user: User, template: str, subject: str, **kwargs):
 
     receiver_email = formataddr((user.name, user.email))
 
-    if current_app.config.get("SMTP_HOST"):
-        send_fn = send_smtp_email
+    if current_app.config.get("MAIL_USE_OUTBOX", False):
+        send_fn = queue_email
     else:
-        send_fn = send_logger_email
+        send_fn = deliver_email
 
     send_fn(sender_email, receiver_email, plain_content, html_content, subject)
 
 
-def send_smtp_email(sender: str, receiver: str, text: str, html: str|None, subject:str):
-    context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
-
-    port = current_app.config.get("SMTP_PORT", 465)
-    host = current_app.config["SMTP_HOST"]
-    username = current_app.config["SMTP_USERNAME"]
-    password = current_app.config["SMTP_PASSWORD"]
-
-    extra_headers: dict[str, str] = current_app.config.get("SMTP_HEADERS", {})
-
-    with smtplib.SMTP(host, port) as server:
-        server.ehlo()
-        server.starttls(context=context)
-        server.ehlo()
-        server.login(username, password)
+def deliver_email(sender: str, receiver: str, text: str, html: str|None, subject:str):
+    if current_app.config.get("SMTP_HOST"):
+        send_fn = send_smtp_email
+    else:
+        send_fn = send_logger_email
 
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = sender
-        message["To"] = receiver
+    send_fn(sender, receiver, text, html, subject)
+
+
+def queue_email(sender: str, receiver: str, text: str, html: str|None, subject:str):
+    """Store the email in the outbox for the mail-worker command to deliver."""
+    now = datetime.now(timezone.utc)
+    db.session.add(OutboxEmail(
+        sender=sender,
+        receiver=receiver,
+        subject=subject,
+        text=text,
+        html=html,
+        created=now,
+        next_attempt=now,
+    ))
+    db.session.commit()
+
+
+class MailBatch:
+    def __init__(self):
+        self.smtp: "SMTPSender | None" = None
+        self.sent = 0
+        self.started = time.perf_counter()
+
+    def smtp_sender(self) -> "SMTPSender":
+        if self.smtp is None:
+            # Only imported once there's something to send, it brings in smtplib, ssl and email.mime
+            from hackspace_storage.smtp import SMTPSender
+            self.smtp = SMTPSender()
+        return self.smtp
+
+    def close(self):
+        if self.smtp is not None:
+            self.smtp.close()
+
+        elapsed = time.perf_counter() - self.started
+        if self.sent:
+            rate = self.sent / elapsed if elapsed else float("inf")
+            connections = self.smtp.connections if self.smtp else 0
+            current_app.logger.info(
+                f"Sent {self.sent} emails in {elapsed:.2f}s ({rate:.1f}/s) over {connections} SMTP connections"
+            )
+
+
+@contextmanager
+def mail_batch():
+    """Send every email within the block through one shared SMTP connection."""
+    if "mail_batch" in g:
+        # Already batching, let the outer batch own the connection
+        yield g.mail_batch
+        return
+
+    batch = MailBatch()
+    g.mail_batch = batch
+    try:
+        yield batch
+    finally:
+        g.pop("mail_batch")
+        batch.close()
 
-        for k, v in extra_headers.items():
-            message[k] = v
 
-        message.attach(MIMEText(text, "plain"))
+def send_smtp_email(sender: str, receiver: str, text: str, html: str|None, subject:str):
+    from hackspace_storage.smtp import build_message
 
-        if html:
-            message.attach(MIMEText(html, "html"))
+    message = build_message(sender, receiver, text, html, subject)
 
-        server.sendmail(sender, receiver, message.as_string())
+    with mail_batch() as batch:
+        batch.smtp_sender().sendmail(sender, receiver, message)
+        batch.sent += 1
 
 
 def send_logger_email(sender: str, receiver: str, text: str, html: str|None, subject:str):
-    current_app.logger.info(f"Sending email from {sender} to {receiver}: {subject} \n\n {text}")
\ No newline at end of file
+    current_app.logger.info(f"Sending email from {sender} to {receiver}: {subject} \n\n {text}")
@@ -1,4 +1,7 @@
 from flask_wtf import FlaskForm
 
 class DeleteConfirmForm(FlaskForm):
-    pass
\ No newline at end of file
+    pass
+
+class ExtendConfirmForm(FlaskForm):
+    pass
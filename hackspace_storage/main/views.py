@@ -1,5 +1,5 @@
 from datetime import timedelta, date
-from flask import Blueprint, flash, g, redirect, render_template, request, session, url_for, abort, current_app
+from flask import Blueprint, flash, g, jsonify, redirect, render_template, request, session, url_for, abort, current_app
 import secrets
 from flask_wtf import FlaskForm
 import sqlalchemy as sa
@@ -7,24 +7,121 @@ from sqlalchemy.orm import joinedload
 from wtforms import BooleanField, DateField, TextAreaField, ValidationError
 from wtforms.validators import DataRequired, InputRequired
 
-from hackspace_storage.booking_rules import BookingError, try_make_booking, extend_booking
+from hackspace_storage.booking_rules import BookingError, try_make_booking, extend_booking, delete_booking
+from hackspace_storage.cache import grid_cache
+from hackspace_storage.events import slot_events
 from hackspace_storage.mailer import send_email
 
-from .forms import DeleteConfirmForm
+from .forms import DeleteConfirmForm, ExtendConfirmForm
+from hackspace_storage.booking_links import booking_links
 from hackspace_storage.database import db
 from hackspace_storage.login import login_required, login_manager
 from hackspace_storage.models import Area, Slot, User, Booking
+from hackspace_storage.read_model import SlotRecord, load_slot_grid, load_slots
+from hackspace_storage.replica import replica_reads
+from hackspace_storage.token import token_to_id
 
 bp = Blueprint("main", __name__, url_prefix="/")
 
 
 @bp.route("/")
 @login_required
+@replica_reads
 def index():
-    area_query = sa.select(Area).join(Area.slots).order_by(Area.name, Slot.name)
-    areas = db.session.scalars(area_query).unique().all()
+    slot_grid = grid_cache.get_or_render(render_slot_grid)
+
+    user_booking_query = (
+        sa.select(Booking)
+        .where(Booking.user_id == g.user.id)
+        .order_by(Booking.id)
+        .options(
+            joinedload(Booking.slot)
+            .joinedload(Slot.area)
+            .joinedload(Area.category)
+        )
+    )
+    user_bookings = db.session.scalars(user_booking_query).all()
+
+    return render_template("main/index.html", slot_grid=slot_grid, user_bookings=user_bookings)
+
+
+def render_slot_grid() -> str:
+    return render_template("main/slot_grid.html", areas=load_slot_grid())
+
 
-    return render_template("main/index.html", areas=areas)
+def slot_json(slot: SlotRecord) -> dict:
+    booking = slot.booking
+    return dict(
+        id=slot.id,
+        name=slot.name,
+        area_id=slot.area_id,
+        version=slot.version,
+        booking=booking and dict(
+            user=booking.user_name,
+            description=booking.description,
+            expiry=booking.expiry.isoformat(),
+        ),
+    )
+
+
+@bp.route("/api/slots")
+@login_required
+@replica_reads
+def slots_api():
+    """Slot availability as JSON.
+
+    The ETag is the newest slot version, so an unchanged poll is answered
+    with a 304 from the cache. With ``since=<version>`` only slots changed
+    after that version are returned.
+
+    A response's version is taken from the slots it contains. Read from a
+    lagging replica it can then be older than the cached version, in which
+    case the client fetches again rather than skipping changes.
+    """
+    version = grid_cache.slot_version(
+        lambda: db.session.scalar(sa.select(sa.func.coalesce(sa.func.max(Slot.version), 0)))
+    )
+    etag = str(version)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        since = request.args.get("since", type=int)
+        if since is None:
+            areas = [
+                dict(
+                    id=area.id,
+                    name=area.name,
+                    column_count=area.column_count,
+                    slots=[slot_json(slot) for slot in area.slots],
+                )
+                for area in load_slot_grid()
+            ]
+            version = max((slot["version"] for area in areas for slot in area["slots"]), default=0)
+            data = dict(version=version, areas=areas)
+        else:
+            slots = [slot_json(slot) for slot in load_slots(Slot.version > since, order_by=Slot.version)]
+            version = max((slot["version"] for slot in slots), default=since)
+            data = dict(version=version, since=since, slots=slots)
+        response = jsonify(data)
+        etag = str(version)
+
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route("/events")
+@login_required
+def events():
+    """Server-sent events for slots being booked, extended or freed.
+
+    Each open stream only holds an idle thread blocked on its queue, so run
+    with a threaded worker class rather than one sync worker per client.
+    Under hackspace_storage.asgi streams are served on the event loop instead.
+    """
+    response = current_app.response_class(slot_events.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 @bp.route("/logout")
 def logout():
@@ -37,6 +134,7 @@ def finish():
 
 @bp.route("/slots/<int:slot_id>/book", methods=["GET", "POST"])
 @login_required
+@replica_reads
 def book_slot(slot_id: int):
     slot = db.get_or_404(Slot, slot_id)
 
@@ -68,7 +166,7 @@ def book_slot(slot_id: int):
 
     if form.validate_on_submit():
         try:
-            booking = try_make_booking(
+            booking, token = try_make_booking(
                 g.user,
                 slot,
                 form.description.data or "",
@@ -76,14 +174,10 @@ def book_slot(slot_id: int):
             )
             flash(f"Booking success", 'success')
 
-            reminder_date = booking.expiry - timedelta(days=slot.area.category.extension_period_days)
-            if reminder_date <= date.today():
-                # If reminder date is in the past or today then skip sending it
-                reminder_date = None
-                booking.reminder_sent = True
-                db.session.commit()
-            else:
-                reminder_date=reminder_date.strftime("%d-%b-%Y")
+            # If reminder date is in the past or today then it won't be sent
+            reminder_date = None
+            if not booking.reminder_sent:
+                reminder_date = booking.reminder_date.strftime("%d-%b-%Y")
 
             send_email(
                 g.user,
@@ -91,6 +185,7 @@ def book_slot(slot_id: int):
                 subject="Booking created",
                 slot=slot,
                 booking=booking,
+                token=token,
                 reminder_date=reminder_date
             )
 
@@ -102,6 +197,7 @@ def book_slot(slot_id: int):
 
 @bp.route("/bookings/<int:booking_id>/free", methods=["GET", "POST"])
 @login_required
+@replica_reads
 def free_booking(booking_id: int):
     booking = db.get_or_404(Booking, booking_id)
     if booking.user != g.user:
@@ -110,8 +206,7 @@ def free_booking(booking_id: int):
     form = DeleteConfirmForm()
 
     if form.validate_on_submit():
-        db.session.delete(booking)
-        db.session.commit()
+        delete_booking(booking)
         flash("Booking deleted", "success")
         return redirect(url_for(".index"))
 
@@ -120,25 +215,63 @@ def free_booking(booking_id: int):
 
 @bp.route("/bookings/<int:booking_id>/free-email", methods=["GET", "POST"])
 def free_booking_email(booking_id: int):
+    """Links from emails sent before they were signed, which carry the token itself."""
     booking = db.session.get(Booking, booking_id)
 
+    try:
+        token_id = token_to_id(request.args.get("token", ""))
+    except ValueError:
+        token_id = ""
+
     if (not booking
-        or not booking.secret
-        or not secrets.compare_digest(booking.secret, request.args.get("token", ""))
+        or not booking.token_id
+        or not secrets.compare_digest(booking.token_id, token_id)
         ):
         abort(403, description="Booking link expired or invalid.")
 
+    return free_restricted(booking)
+
+
+@bp.route("/bookings/free/<token>", methods=["GET", "POST"])
+def free_booking_link(token: str):
+    booking = booking_links.load_booking(token, "free")
+    if not booking:
+        abort(403, description="Booking link expired or invalid.")
+
+    return free_restricted(booking)
+
+
+def free_restricted(booking: Booking):
     form = DeleteConfirmForm()
 
     if form.validate_on_submit():
-        db.session.delete(booking)
-        db.session.commit()
+        delete_booking(booking)
         flash("Booking deleted", "success")
         return redirect(url_for(".finish"))
 
     return render_template("main/delete_booking_restricted.html", form=form, booking=booking)
 
 
+@bp.route("/bookings/extend/<token>", methods=["GET", "POST"])
+def extend_booking_link(token: str):
+    booking = booking_links.load_booking(token, "extend")
+    if not booking:
+        abort(403, description="Booking link expired or invalid.")
+
+    # Confirmed with a POST so that mail scanners following the link don't extend the booking
+    form = ExtendConfirmForm()
+
+    if form.validate_on_submit():
+        try:
+            extend_booking(booking)
+            flash("Extension success", 'success')
+        except BookingError as ex:
+            flash(ex.reason, 'error')
+        return redirect(url_for(".finish"))
+
+    return render_template("main/extend_booking_restricted.html", form=form, booking=booking)
+
+
 @bp.route("/bookings/<int:booking_id>/extend")
 @login_required
 def extend(booking_id: int):
@@ -163,4 +296,20 @@ def backchannel_logout():
     if not login_manager.process_logout_token(logout_token):
         abort (400)
 
-    return ""
\ No newline at end of file
+    return ""
+
+@bp.route("/backchannel-logout/batch", methods=["POST"])
+def backchannel_logout_batch():
+    """Like /backchannel-logout but takes any number of logout_token fields.
+
+    Either send one token per session, or one token with a list of sids in
+    its ``sids`` claim. Every token must be valid or nothing is logged out.
+    """
+    logout_tokens = request.form.getlist("logout_token")
+    if not logout_tokens:
+        abort(400)
+
+    if not login_manager.process_logout_tokens(logout_tokens):
+        abort(400)
+
+    return ""
@@ -2,7 +2,7 @@
 from collections import defaultdict
 import datetime
 from typing import Any, Optional
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, ForeignKey, Sequence, UniqueConstraint, select
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func, expression
 from uuid import UUID
@@ -19,9 +19,17 @@ class User(PkModel):
     logins: Mapped[list["Login"]] = relationship(back_populates="user")
 
     def bookings_per_category(self) -> defaultdict["Category", int]:
+        query = (
+            select(Category, func.count(Booking.id))
+            .join(Category.areas)
+            .join(Area.slots)
+            .join(Slot.bookings)
+            .where(Booking.user_id == self.id)
+            .group_by(Category.id)
+        )
         counts = defaultdict(int)
-        for booking in self.bookings:
-            counts[booking.slot.area.category] += 1
+        for category, count in db.session.execute(query):
+            counts[category] = count
         return counts
     
 # Calling this a Login instead of Session to avoid confusion with Flask's own session API
@@ -30,14 +38,15 @@ class Login(Model):
     external_id: Mapped[Optional[str]] = mapped_column(unique=True, index=True) # Obtained from the sid claim in the login token
     # We don't just rely on the id as UUID generation isn't guaranteed to use a CSPRNG
     secret: Mapped[str]
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
-    created: Mapped[datetime.datetime] = mapped_column(UTCDateTime())
-    expiry: Mapped[datetime.datetime] = mapped_column(UTCDateTime())
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+    # Indexed so reap-logins can find expired logins without scanning live ones
+    created: Mapped[datetime.datetime] = mapped_column(UTCDateTime(), index=True)
+    expiry: Mapped[datetime.datetime] = mapped_column(UTCDateTime(), index=True)
 
     user: Mapped["User"] = relationship(back_populates="logins")
 
 class Category(PkModel):
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(unique=True)
     max_bookings: Mapped[int]
     initial_duration_days: Mapped[int]
     extension_duration_days: Mapped[int]
@@ -47,29 +56,52 @@ class Category(PkModel):
     areas: Mapped[list["Area"]] = relationship(back_populates="category")
 
 class Area(PkModel):
-    name: Mapped[str]
-    category_id: Mapped[int] = mapped_column(ForeignKey("category.id"))
+    name: Mapped[str] = mapped_column(unique=True)
+    category_id: Mapped[int] = mapped_column(ForeignKey("category.id"), index=True)
     column_count: Mapped[int]
 
     slots: Mapped[list["Slot"]] = relationship(back_populates="area", order_by="Slot.name")
     category: Mapped["Category"] = relationship(back_populates="areas")
 
+slot_version_seq = Sequence("slot_version_seq")
+
 class Slot(PkModel):
+    __table_args__ = (UniqueConstraint("area_id", "name"),)
+
     name: Mapped[str]
-    area_id: Mapped[int] = mapped_column(ForeignKey("area.id"))
+    area_id: Mapped[int] = mapped_column(ForeignKey("area.id"), index=True)
+    # Taken from slot_version_seq every time the slot's booking changes, so clients can ask what changed since a version
+    version: Mapped[int] = mapped_column(
+        BigInteger, slot_version_seq, server_default=slot_version_seq.next_value(), index=True
+    )
 
     area: Mapped["Area"] = relationship(back_populates="slots")
-    # Data model allows multiple bookings, howeve application will restrict this
+    # Kept as a list for convenience, but the unique index on booking.slot_id allows at most one
     bookings: Mapped[list["Booking"]] = relationship(back_populates="slot")
 
 class Booking(PkModel):
-    slot_id: Mapped[int] = mapped_column(ForeignKey("slot.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
-    expiry: Mapped[datetime.date]
+    slot_id: Mapped[int] = mapped_column(ForeignKey("slot.id"), index=True, unique=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+    expiry: Mapped[datetime.date] = mapped_column(index=True)
     extensions: Mapped[int] = mapped_column(server_default="0")
     description: Mapped[str]
     reminder_sent: Mapped[bool] = mapped_column(server_default=expression.false())
-    secret: Mapped[Optional[str]]
+    # expiry less the category's extension period, from when the booking can be extended
+    reminder_date: Mapped[datetime.date] = mapped_column(index=True)
+    # token_to_id of the token in the booking's email links. Only the emails have the token itself.
+    token_id: Mapped[Optional[str]] = mapped_column(index=True, unique=True)
 
     slot: Mapped["Slot"] = relationship(back_populates="bookings")
-    user: Mapped["User"] = relationship(back_populates="bookings")
\ No newline at end of file
+    user: Mapped["User"] = relationship(back_populates="bookings")
+
+class OutboxEmail(PkModel):
+    sender: Mapped[str]
+    receiver: Mapped[str]
+    subject: Mapped[str]
+    text: Mapped[str]
+    html: Mapped[Optional[str]]
+    created: Mapped[datetime.datetime] = mapped_column(UTCDateTime())
+    # Cleared once delivery has been given up on, so the row is kept for inspection but never retried
+    next_attempt: Mapped[Optional[datetime.datetime]] = mapped_column(UTCDateTime(), index=True)
+    attempts: Mapped[int] = mapped_column(server_default="0")
+    last_error: Mapped[Optional[str]]
@@ -1,52 +1,197 @@
-from datetime import date, timedelta
+from collections import defaultdict
+from datetime import date, datetime, timezone
 import click
-from flask import Blueprint
+from flask import Blueprint, current_app
 import sqlalchemy as sa
+from sqlalchemy.orm import joinedload
 
-from hackspace_storage.booking_rules import can_extend_booking
+from hackspace_storage.booking_rules import mark_slots_changed
+from hackspace_storage.cache import grid_cache
 from hackspace_storage.database import db
-from hackspace_storage.mailer import send_email
-from hackspace_storage.models import Area, Category, Slot, Booking, User
+from hackspace_storage.login import login_manager
+from hackspace_storage.mailer import mail_batch, send_email
+from hackspace_storage.models import Login, Slot, Booking, User
+from hackspace_storage.token import generate_token, token_to_id
 
 bp = Blueprint('nightly', __name__, cli_group=None)
 
 
+def reminder_due(today: date):
+    """Bookings inside their extension period that haven't had a reminder yet.
+
+    Bookings that are about to be deleted as expired don't get a reminder.
+    """
+    return (
+        Booking.reminder_sent == sa.false(),
+        Booking.reminder_date <= today,
+        Booking.expiry >= today,
+    )
+
+
+def expired(today: date):
+    return (Booking.expiry < today,)
+
+
+def load_bookings(*criteria) -> list[Booking]:
+    query = (
+        sa.select(Booking)
+        .where(*criteria)
+        .order_by(Booking.id)
+        .options(
+            joinedload(Booking.slot).joinedload(Slot.area),
+            joinedload(Booking.user),
+        )
+    )
+    return list(db.session.scalars(query).unique())
+
+
 @bp.cli.command("nightly")
 @click.option('--dry-run', is_flag=True)
 def nightly(dry_run: bool):
-    query = sa.select(Booking)
-    bookings = db.session.execute(query).scalars()
-
     today = date.today()
 
-    for booking in bookings:
-        if can_extend_booking(booking)[0] and booking.reminder_sent == False:
-            if dry_run:
-                print(f"Expiry reminder for booking {booking.description} with expiry {booking.expiry} from slot {booking.slot.name}. Booked by {booking.user.name}")
-            else:
-                pass
-                booking.reminder_sent = True
-                db.session.commit()
-
-                send_email(
-                    booking.user,
-                    "email/expiry_reminder",
-                    subject="Booking expiry reminder",
-                    slot=booking.slot,
-                    booking=booking,
-                )
-
-        if today > booking.expiry:
-            if dry_run:
-                print(f"Delete booking {booking.description} with expiry {booking.expiry} from slot {booking.slot.name}. Booked by {booking.user.name}")
-            else:
-                db.session.delete(booking)
-                db.session.commit()
-
-                send_email(
-                    booking.user,
-                    "email/expired",
-                    subject="Booking expired",
-                    slot=booking.slot,
-                    booking=booking
-                )
\ No newline at end of file
+    if dry_run:
+        for booking in load_bookings(*reminder_due(today)):
+            print(f"Expiry reminder for booking {booking.description} with expiry {booking.expiry} from slot {booking.slot.name}. Booked by {booking.user.name}")
+        for booking in load_bookings(*expired(today)):
+            print(f"Delete booking {booking.description} with expiry {booking.expiry} from slot {booking.slot.name}. Booked by {booking.user.name}")
+        return
+
+    reminder_query = (
+        sa.update(Booking)
+        .where(*reminder_due(today))
+        .values(reminder_sent=True)
+        .returning(Booking.id)
+        .execution_options(synchronize_session=False)
+    )
+    reminder_ids = db.session.scalars(reminder_query).all()
+    # The reminders carry new links, only the hashes of their tokens are stored
+    reminder_tokens = {booking_id: generate_token() for booking_id in reminder_ids}
+    if reminder_tokens:
+        db.session.execute(
+            sa.update(Booking),
+            [dict(id=booking_id, token_id=token_to_id(token)) for booking_id, token in reminder_tokens.items()],
+        )
+
+    delete_query = (
+        sa.delete(Booking)
+        .where(*expired(today))
+        .returning(Booking.id, Booking.slot_id, Booking.user_id, Booking.description, Booking.expiry)
+        .execution_options(synchronize_session=False)
+    )
+    expired_bookings = db.session.execute(delete_query).all()
+    if expired_bookings:
+        mark_slots_changed({booking.slot_id for booking in expired_bookings}, "freed")
+
+    db.session.commit()
+
+    if reminder_ids or expired_bookings:
+        grid_cache.invalidate()
+
+    with mail_batch():
+        reminders = [
+            (booking, reminder_tokens[booking.id])
+            for booking in load_bookings(Booking.id.in_(reminder_ids))
+        ]
+        send_digests(reminders, expired_bookings)
+
+
+def send_digests(reminders: list[tuple[Booking, str]], expired_bookings: list[sa.Row]):
+    """Send each member one email covering all their reminders and expired bookings.
+
+    A failed send is logged and skipped, and those reminders are left to be
+    sent again in the next run.
+    """
+    users = {booking.user_id: booking.user for booking, _ in reminders}
+    digests = defaultdict(lambda: ([], []))
+    for booking, token in reminders:
+        digests[booking.user_id][0].append((booking, token))
+
+    if expired_bookings:
+        # The rows are already gone, so look up what the email needs by id
+        slot_query = (
+            sa.select(Slot)
+            .where(Slot.id.in_({booking.slot_id for booking in expired_bookings}))
+            .options(joinedload(Slot.area))
+        )
+        slots = {slot.id: slot for slot in db.session.scalars(slot_query)}
+        user_ids = {booking.user_id for booking in expired_bookings} - users.keys()
+        if user_ids:
+            users.update((user.id, user) for user in db.session.scalars(sa.select(User).where(User.id.in_(user_ids))))
+
+        for booking in expired_bookings:
+            digests[booking.user_id][1].append((booking, slots[booking.slot_id]))
+
+    failed = []
+    unsent_reminders = []
+    for user_id, (user_reminders, user_expired) in digests.items():
+        if user_reminders and user_expired:
+            subject = "Booking reminders and expiries"
+        elif user_reminders:
+            subject = "Booking expiry reminder"
+        else:
+            subject = "Booking expired"
+
+        user = users[user_id]
+        try:
+            send_email(
+                user,
+                "email/nightly_digest",
+                subject=subject,
+                reminders=user_reminders,
+                expired=user_expired,
+            )
+        except Exception as ex:
+            # One bad address or dead connection shouldn't cost everyone else their email
+            db.session.rollback()
+            current_app.logger.error(f"Failed to send nightly digest to {user.email}: {ex}")
+            failed.append(user_id)
+            unsent_reminders.extend(booking.id for booking, _ in user_reminders)
+
+    if unsent_reminders:
+        # Try the reminders again in the next run. Expiry notices can't be, the bookings are gone.
+        query = sa.update(Booking).where(Booking.id.in_(unsent_reminders)).values(reminder_sent=False)
+        db.session.execute(query, execution_options=dict(synchronize_session=False))
+        db.session.commit()
+
+    if failed:
+        raise click.ClickException(f"Failed to send {len(failed)} of {len(digests)} nightly digests")
+
+
+@bp.cli.command("reap-logins")
+@click.option('--batch-size', default=1000, show_default=True, help='Logins deleted per transaction')
+@click.option('--vacuum', is_flag=True, help='VACUUM the login table afterwards')
+def reap_logins(batch_size: int, vacuum: bool):
+    """Delete logins past their idle or absolute timeout.
+
+    Otherwise they are only cleaned up if the same cookie comes back. Each
+    batch is its own short transaction and skips rows locked by requests
+    in flight, so it can run while the site is in use.
+    """
+    now = datetime.now(timezone.utc)
+    batch = (
+        sa.select(Login.id)
+        .where(login_manager.expired(now))
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    delete_query = (
+        sa.delete(Login)
+        .where(Login.id.in_(batch.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+
+    removed = 0
+    while True:
+        deleted = db.session.execute(delete_query).rowcount
+        db.session.commit()
+        removed += deleted
+        if deleted < batch_size:
+            break
+
+    print(f"Removed {removed} expired logins")
+
+    if vacuum:
+        # VACUUM can't run inside a transaction
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(sa.text("VACUUM (ANALYZE) login"))
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import time
+import click
+from flask import Blueprint, current_app
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+from hackspace_storage.mailer import deliver_email, mail_batch
+from hackspace_storage.models import OutboxEmail
+
+bp = Blueprint('outbox', __name__, cli_group=None)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    base = current_app.config.get("MAIL_OUTBOX_RETRY_DELAY", 30)
+    limit = current_app.config.get("MAIL_OUTBOX_MAX_RETRY_DELAY", 60*60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), limit))
+
+
+def drain_outbox(batch_size: int) -> int:
+    """Deliver one batch of due emails, returning how many were attempted.
+
+    Rows are claimed with SKIP LOCKED so several workers can drain the outbox
+    side by side without sending the same email twice.
+    """
+    max_attempts = current_app.config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 8)
+    now = datetime.now(timezone.utc)
+
+    query = (
+        sa.select(OutboxEmail)
+        .where(OutboxEmail.next_attempt <= now)
+        .order_by(OutboxEmail.next_attempt)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    emails = db.session.scalars(query).all()
+
+    with mail_batch():
+        for email in emails:
+            try:
+                deliver_email(email.sender, email.receiver, email.text, email.html, email.subject)
+            except Exception as ex:
+                email.attempts += 1
+                email.last_error = str(ex)
+                if email.attempts >= max_attempts:
+                    email.next_attempt = None
+                    current_app.logger.error(f"Giving up on email {email.id} to {email.receiver}: {ex}")
+                else:
+                    email.next_attempt = now + retry_delay(email.attempts)
+                    current_app.logger.warning(f"Failed to send email {email.id} to {email.receiver}, will retry: {ex}")
+            else:
+                db.session.delete(email)
+
+    db.session.commit()
+    return len(emails)
+
+
+def run_worker(batch_size: int, poll_interval: float, once: bool):
+    max_backoff = current_app.config.get("MAIL_OUTBOX_MAX_RETRY_DELAY", 60*60)
+    failures = 0
+    while True:
+        try:
+            attempted = drain_outbox(batch_size)
+        except sa.exc.SQLAlchemyError as ex:
+            # Keep this thread going, the database may well come back
+            db.session.rollback()
+            failures += 1
+            backoff = min(poll_interval * 2 ** failures, max_backoff)
+            current_app.logger.error(f"Mail worker database error, retrying in {backoff:.1f}s: {ex}")
+            time.sleep(backoff)
+            continue
+
+        failures = 0
+        if attempted < batch_size:
+            if once:
+                return
+            time.sleep(poll_interval)
+
+
+@bp.cli.command("mail-worker")
+@click.option('--threads', default=1, help='Number of worker threads draining the outbox')
+@click.option('--batch-size', default=50, help='Emails claimed per batch')
+@click.option('--poll-interval', default=5.0, help='Seconds to wait when the outbox is empty')
+@click.option('--once', is_flag=True, help='Exit once the outbox has been drained')
+def mail_worker(threads: int, batch_size: int, poll_interval: float, once: bool):
+    app = current_app._get_current_object()
+
+    def work():
+        # Each thread gets its own app context and therefore its own session
+        with app.app_context():
+            run_worker(batch_size, poll_interval, once)
+
+    with ThreadPoolExecutor(threads) as executor:
+        for future in [executor.submit(work) for _ in range(threads)]:
+            future.result()
@@ -0,0 +1,150 @@
+import csv
+import tomllib
+import click
+from flask import Blueprint
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from hackspace_storage.booking_rules import update_reminder_dates
+from hackspace_storage.cache import grid_cache
+from hackspace_storage.database import db
+from hackspace_storage.models import Area, Category, Slot
+
+bp = Blueprint('provisioning', __name__, cli_group=None)
+
+BATCH_SIZE = 1000
+
+CATEGORY_FIELDS = [
+    "max_bookings",
+    "initial_duration_days",
+    "extension_duration_days",
+    "extension_period_days",
+    "max_extensions",
+]
+
+
+def load_layout(layout_file, slots_file) -> tuple[list[dict], list[dict], list[dict]]:
+    """Read categories, areas and slots from a TOML layout and optional CSV of slots.
+
+    The TOML layout has ``[[categories]]`` and ``[[areas]]`` tables. An area
+    names its category and lists its slots either explicitly with ``slots``
+    or as ``slot_count`` slots named ``<slot_prefix><NNN>``. The CSV has
+    ``area`` and ``slot`` columns for adding further slots to those areas.
+    """
+    layout = tomllib.load(layout_file)
+
+    categories = [
+        dict(name=category["name"], **{field: category[field] for field in CATEGORY_FIELDS})
+        for category in layout.get("categories", [])
+    ]
+
+    areas = []
+    slots = []
+    for area in layout.get("areas", []):
+        areas.append(dict(name=area["name"], category=area["category"], column_count=area["column_count"]))
+
+        names = list(area.get("slots", []))
+        prefix = area.get("slot_prefix", area["name"][0])
+        names += [f"{prefix}{i:03}" for i in range(area.get("slot_count", 0))]
+        slots += [dict(area=area["name"], name=name) for name in names]
+
+    if slots_file is not None:
+        slots += [dict(area=row["area"], name=row["slot"]) for row in csv.DictReader(slots_file)]
+
+    return unique_by(categories, "name"), unique_by(areas, "name"), unique_by(slots, "area", "name")
+
+
+def batched(rows: list[dict]):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def unique_by(rows: list[dict], *keys: str) -> list[dict]:
+    # A single INSERT ... ON CONFLICT can't touch the same row twice, so later duplicates win
+    return list({tuple(row[key] for key in keys): row for row in rows}.values())
+
+
+def upsert_categories(categories: list[dict]) -> dict[str, int]:
+    ids = {}
+    for batch in batched(categories):
+        stmt = insert(Category).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Category.name],
+            set_={field: stmt.excluded[field] for field in CATEGORY_FIELDS},
+        ).returning(Category.name, Category.id)
+        ids.update((name, id) for name, id in db.session.execute(stmt))
+    return ids
+
+
+def upsert_areas(areas: list[dict], category_ids: dict[str, int]) -> dict[str, int]:
+    ids = {}
+    rows = [
+        dict(name=area["name"], category_id=category_ids[area["category"]], column_count=area["column_count"])
+        for area in areas
+    ]
+    for batch in batched(rows):
+        stmt = insert(Area).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Area.name],
+            set_=dict(category_id=stmt.excluded.category_id, column_count=stmt.excluded.column_count),
+        ).returning(Area.name, Area.id)
+        ids.update((name, id) for name, id in db.session.execute(stmt))
+    return ids
+
+
+def insert_slots(slots: list[dict], area_ids: dict[str, int]) -> int:
+    """Add any slots that don't exist yet, returning how many were new."""
+    rows = [dict(area_id=area_ids[slot["area"]], name=slot["name"]) for slot in slots]
+    created = 0
+    for batch in batched(rows):
+        stmt = insert(Slot).values(batch).on_conflict_do_nothing(
+            index_elements=[Slot.area_id, Slot.name]
+        ).returning(Slot.id)
+        created += len(db.session.execute(stmt).all())
+    return created
+
+
+def lookup_ids(model, names: set[str]) -> dict[str, int]:
+    query = sa.select(model.name, model.id).where(model.name.in_(names))
+    return {name: id for name, id in db.session.execute(query)}
+
+
+@bp.cli.command("provision")
+@click.argument("layout", type=click.File("rb"))
+@click.option('--slots', 'slots_file', type=click.File("r", encoding="utf-8"), help='CSV of extra area,slot rows')
+@click.option('--dry-run', is_flag=True, help='Report what would change without committing')
+def provision(layout, slots_file, dry_run: bool):
+    """Create or update categories, areas and slots from a layout file.
+
+    Everything is upserted in one transaction. Existing slots and their
+    bookings are left alone, and slots missing from the layout are not removed.
+    """
+    categories, areas, slots = load_layout(layout, slots_file)
+
+    category_ids = lookup_ids(Category, {area["category"] for area in areas})
+    category_ids.update(upsert_categories(categories))
+
+    missing = {area["category"] for area in areas} - category_ids.keys()
+    if missing:
+        raise click.ClickException(f"Unknown categories: {', '.join(sorted(missing))}")
+
+    area_ids = lookup_ids(Area, {slot["area"] for slot in slots})
+    area_ids.update(upsert_areas(areas, category_ids))
+    # After the areas, as one moving to another category takes its bookings with it
+    update_reminder_dates(category_ids.values())
+
+    missing = {slot["area"] for slot in slots} - area_ids.keys()
+    if missing:
+        raise click.ClickException(f"Unknown areas: {', '.join(sorted(missing))}")
+
+    created = insert_slots(slots, area_ids)
+
+    print(f"{len(categories)} categories and {len(areas)} areas upserted, {created} of {len(slots)} slots new")
+
+    if dry_run:
+        db.session.rollback()
+        print("Dry run, nothing committed")
+        return
+
+    db.session.commit()
+    grid_cache.invalidate()
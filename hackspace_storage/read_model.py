@@ -0,0 +1,75 @@
+"""Plain records for pages that only display slots.
+
+Loading the slot grid as ORM objects means an Area, Slot, Booking and User
+instance per row, each tracked in the identity map, just to print a few
+columns. These come from a single Core query and are tuples instead.
+"""
+import datetime
+from typing import NamedTuple
+
+import sqlalchemy as sa
+
+from hackspace_storage.database import db
+from hackspace_storage.models import Area, Booking, Slot, User
+
+
+class BookingRecord(NamedTuple):
+    user_name: str
+    description: str
+    expiry: datetime.date
+
+
+class SlotRecord(NamedTuple):
+    id: int
+    name: str
+    area_id: int
+    version: int
+    booking: BookingRecord | None
+
+
+class AreaRecord(NamedTuple):
+    id: int
+    name: str
+    column_count: int
+    slots: list[SlotRecord]
+
+
+def slot_query() -> sa.Select:
+    return (
+        sa.select(
+            Slot.id, Slot.name, Slot.area_id, Slot.version,
+            Booking.id, User.name, Booking.description, Booking.expiry,
+        )
+        .outerjoin(Slot.bookings)
+        .outerjoin(Booking.user)
+    )
+
+
+def slot_record(row) -> SlotRecord:
+    slot_id, name, area_id, version, booking_id, user_name, description, expiry = row
+    booking = None if booking_id is None else BookingRecord(user_name, description, expiry)
+    return SlotRecord(slot_id, name, area_id, version, booking)
+
+
+def load_slot_grid() -> list[AreaRecord]:
+    """Every area that has slots, with its slots in name order."""
+    query = (
+        slot_query()
+        .add_columns(Area.name, Area.column_count)
+        .join(Slot.area)
+        .order_by(Area.name, Slot.name)
+    )
+
+    areas: list[AreaRecord] = []
+    for row in db.session.execute(query).tuples():
+        slot = slot_record(row[:-2])
+        if not areas or areas[-1].id != slot.area_id:
+            area_name, column_count = row[-2:]
+            areas.append(AreaRecord(slot.area_id, area_name, column_count, []))
+        areas[-1].slots.append(slot)
+    return areas
+
+
+def load_slots(*criteria, order_by=Slot.id) -> list[SlotRecord]:
+    query = slot_query().where(*criteria).order_by(order_by)
+    return [slot_record(row) for row in db.session.execute(query).tuples()]
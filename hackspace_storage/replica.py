@@ -0,0 +1,139 @@
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+from flask import Flask, current_app, has_request_context, request, session
+import sqlalchemy as sa
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from hackspace_storage.database import db
+
+BIND = "replica"
+
+PRIMARY_LSN_QUERY = sa.text("SELECT CAST(pg_current_wal_lsn() AS text)")
+
+# Replication lag in seconds, given the primary's WAL position from just
+# before. A replica that has replayed up to there has everything the primary
+# had, otherwise the replay timestamp would make an idle primary look like a
+# lagging replica. Comparing with what the replica has received instead
+# would make one that has stopped receiving WAL look caught up too.
+LAG_QUERY = sa.text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0
+        ELSE COALESCE(CAST(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS float8), 'Infinity')
+    END
+""")
+
+
+class ReplicaRouter:
+    """Sends the reads of read only views to a replica, when a "replica" bind
+    is configured in SQLALCHEMY_BINDS.
+
+    Everything else stays on the primary, as do a client's reads for
+    REPLICA_READ_YOUR_WRITES seconds after it last wrote anything. If the
+    replica falls more than REPLICA_MAX_LAG seconds behind, or can't be
+    reached, all reads go back to the primary until it catches up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._fresh = False
+
+    def init_app(self, app: Flask):
+        self.enabled = BIND in app.config.get("SQLALCHEMY_BINDS", {})
+        self.max_lag = app.config.get("REPLICA_MAX_LAG", 5)
+        self.check_interval = app.config.get("REPLICA_LAG_CHECK_INTERVAL", 5)
+        self.read_your_writes = app.config.get("REPLICA_READ_YOUR_WRITES", 10)
+
+        app.extensions["replica_router"] = self
+
+    def use_replica(self) -> bool:
+        if not self.enabled:
+            return False
+        if session.get("primary_until", 0) > time.time():
+            return False
+        return self.replica_fresh()
+
+    def replica_fresh(self) -> bool:
+        """Whether the replica is within REPLICA_MAX_LAG, checked at most every REPLICA_LAG_CHECK_INTERVAL."""
+        with self._lock:
+            if time.monotonic() - self._checked < self.check_interval:
+                return self._fresh
+            # Other requests carry on with the last result while this one checks
+            self._checked = time.monotonic()
+
+        try:
+            with db.engines[None].connect() as connection:
+                primary_lsn = connection.execute(PRIMARY_LSN_QUERY).scalar_one()
+            with db.engines[BIND].connect() as connection:
+                lag = connection.execute(LAG_QUERY, dict(primary_lsn=primary_lsn)).scalar_one()
+            fresh = lag <= self.max_lag
+            if not fresh:
+                current_app.logger.warning(f"Replica is {lag:.1f}s behind, reading from the primary")
+        except sa.exc.DBAPIError as ex:
+            current_app.logger.warning(f"Replica lag check failed, reading from the primary: {ex}")
+            fresh = False
+
+        self._fresh = fresh
+        return fresh
+
+
+replica_router = ReplicaRouter()
+
+
+def replica_reads(f):
+    """Let the view's reads go to the replica, for GET requests only."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method in ("GET", "HEAD") and replica_router.use_replica():
+            db.session.info["read_bind"] = BIND
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary within the block, whatever the view asked for."""
+    read_bind = db.session.info.pop("read_bind", None)
+    try:
+        yield
+    finally:
+        if read_bind is not None:
+            db.session.info["read_bind"] = read_bind
+
+
+def mark_written():
+    """Treat the session as having written, for writes the listeners below
+    can't see, such as DML in the CTEs of a SELECT."""
+    _wrote(db.session)
+
+
+def _wrote(db_session: Session):
+    db_session.info["wrote"] = True
+    # Anything read after a write should see it
+    db_session.info.pop("read_bind", None)
+
+
+@sa.event.listens_for(Session, "after_flush")
+def _after_flush(db_session: Session, flush_context):
+    _wrote(db_session)
+
+
+@sa.event.listens_for(Session, "do_orm_execute")
+def _after_execute(orm_execute_state: ORMExecuteState):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _wrote(orm_execute_state.session)
+
+
+@sa.event.listens_for(Session, "after_rollback")
+def _after_rollback(db_session: Session):
+    db_session.info.pop("wrote", None)
+
+
+@sa.event.listens_for(Session, "after_commit")
+def _read_your_writes(db_session: Session):
+    if db_session.info.pop("wrote", False) and has_request_context() and replica_router.enabled:
+        # The client's next few requests read from the primary so they see what they just did
+        session["primary_until"] = time.time() + replica_router.read_your_writes
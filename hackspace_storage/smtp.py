@@ -0,0 +1,80 @@
+import smtplib, ssl
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from flask import current_app
+
+from hackspace_storage.instrumentation import instrumentation
+
+
+class SMTPSender:
+    """A single authenticated SMTP connection, reused for every message sent
+    through it and re-established if the server drops it."""
+
+    def __init__(self):
+        self.host = current_app.config["SMTP_HOST"]
+        self.port = current_app.config.get("SMTP_PORT", 465)
+        self.username = current_app.config["SMTP_USERNAME"]
+        self.password = current_app.config["SMTP_PASSWORD"]
+        # Seconds to wait on the server, the outbox worker holds its rows locked while sending
+        self.timeout = current_app.config.get("SMTP_TIMEOUT", 30)
+        self.server: smtplib.SMTP | None = None
+        self.connections = 0
+
+    def connect(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            server.starttls(context=context)
+            server.ehlo()
+            server.login(self.username, self.password)
+        except BaseException:
+            server.close()
+            raise
+
+        self.server = server
+        self.connections += 1
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            self.server.close()
+        self.server = None
+
+    def sendmail(self, sender: str, receiver: str, message: str):
+        with instrumentation.timer("smtp"):
+            for attempt in range(2):
+                if self.server is None:
+                    self.connect()
+                try:
+                    self.server.sendmail(sender, receiver, message)
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Connection went stale between messages, reconnect and retry once
+                    self.server = None
+                    if attempt:
+                        raise
+
+
+def build_message(sender: str, receiver: str, text: str, html: str|None, subject:str) -> str:
+    extra_headers: dict[str, str] = current_app.config.get("SMTP_HEADERS", {})
+
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = receiver
+
+    for k, v in extra_headers.items():
+        message[k] = v
+
+    message.attach(MIMEText(text, "plain"))
+
+    if html:
+        message.attach(MIMEText(html, "html"))
+
+    return message.as_string()
@@ -0,0 +1,44 @@
+import os
+
+from flask import Blueprint, Flask, current_app
+from jinja2 import FileSystemBytecodeCache
+
+bp = Blueprint('templating', __name__, cli_group=None)
+
+
+def init_app(app: Flask):
+    """Keep compiled templates in the instance folder so a freshly started
+    worker can load them instead of compiling every template again.
+
+    Jinja checks each cached entry against the template source, so edited
+    templates are recompiled rather than served stale.
+    """
+    if not app.config.get("TEMPLATE_CACHE_ENABLED", True):
+        return
+
+    cache_dir = app.config.get("TEMPLATE_CACHE_DIR", os.path.join(app.instance_path, "template_cache"))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Jinja would otherwise fail every template compile trying to write the cache
+        if not os.access(cache_dir, os.W_OK):
+            raise PermissionError(f"{cache_dir} is not writable")
+    except OSError as ex:
+        app.logger.warning(f"Template cache disabled: {ex}")
+        return
+
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+@bp.cli.command("prewarm-templates")
+def prewarm_templates():
+    """Compile every template into the bytecode cache, for running at deploy time."""
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        print("Template cache is disabled, nothing to do")
+        return
+
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+
+    print(f"Compiled {len(names)} templates")